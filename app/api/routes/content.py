@@ -1,34 +1,27 @@
 from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi.responses import StreamingResponse
 from app.api.schemas.user import UserRequest
-from app.api.schemas.investment import InvestmentSimulationRequest, InvestmentSimulationResponse
+from app.api.schemas.investment import InvestmentSimulationRequest, InvestmentSimulationResponse, InvestmentSimulationBatchRequest, MonteCarloSimulationRequest
 from app.api.services.classification import ProfileClassifier
-from app.api.services.ia_generator import IAGenerator
+from app.api.services.ia_generator import IAGenerator, get_ia_generator
 from app.api.services.memory_manager import MemoryManager
 from app.api.services.investment_calculator import InvestmentCalculator
 from app.api.services.analytics_engine import AnalyticsEngine
 from app.api.services import mongodb_crud
+from app.api.services.write_behind import write_behind
+from app.api.services.interaction_records import history_record
+from app.core.config.settings import settings
 from datetime import datetime, timezone
 from bson import ObjectId
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional
+import asyncio
 import json
 
 router = APIRouter(prefix="", tags=["API"])
 
-@router.post("/gerar-conteudo", status_code=status.HTTP_201_CREATED)
-async def generate_financial_content(
-    request: UserRequest, 
-    classifier: ProfileClassifier = Depends(),
-    ia_generator: IAGenerator = Depends(),
-    memory_manager: MemoryManager = Depends(),
-    investment_calculator: InvestmentCalculator = Depends(),
-    analytics_engine: AnalyticsEngine = Depends()
-):
-    """Endpoint principal com todas as funcionalidades inteligentes"""
-    
-    # 1. Classificação do perfil com regex melhorado
-     # 2. Encontrar ou criar usuário
+async def _find_or_create_user(request: UserRequest):
+    """Encontra o usuário pelo nome e idade (atualizando os dados da requisição) ou cria um novo"""
     user = await mongodb_crud.find_document("usuarios", {"nome": request.nome, "idade": request.idade})
-    user_id = None
     if user:
         user_id = str(user["_id"])
         await mongodb_crud.update_document("usuarios", {"_id": ObjectId(user_id)}, {
@@ -49,63 +42,147 @@ async def generate_financial_content(
             "updated_at": datetime.now(timezone.utc)
         }
         user_id = await mongodb_crud.create_document("usuarios", user_data)
+    return user, user_id
 
-    # 1. Classificação do perfil com regex melhorado, usando histórico de conversas
-    conversation_history = await memory_manager.get_user_memory(user_id) if user_id else None
-    profile_percentages = classifier.classify_profile(
+PEER_ANALYSIS_FALLBACK = {"message": "Análise comparativa indisponível no momento", "total_peers": 0}
+
+async def _run_stage(name: str, coro, timeout: float, fallback, degraded: List[str]):
+    """Executa uma etapa com tempo máximo; em erro ou timeout usa o resultado degradado"""
+    try:
+        return await asyncio.wait_for(coro, timeout)
+    except Exception as e:
+        print(f"Etapa '{name}' degradada: {e!r}")
+        degraded.append(name)
+        return fallback() if callable(fallback) else fallback
+
+def _classify(request: UserRequest, classifier: ProfileClassifier, memory: Optional[dict]) -> Dict[str, float]:
+    return classifier.classify_profile(
         request.objetivo_financeiro, 
         request.auto_classificacao,
         request.referencia_texto,
-        conversation_history.get("conversation_history") if conversation_history else None
+        memory.get("conversation_history") if memory else None
+    )
+
+async def _classify_user(request: UserRequest, user_id: str, classifier: ProfileClassifier, memory_manager: MemoryManager):
+    """Classifica o perfil usando o histórico de conversas"""
+    memory = await memory_manager.get_user_memory(user_id) if user_id else None
+    return _classify(request, classifier, memory)
+
+async def _profile_stages(request: UserRequest, user, user_id: str, degraded: List[str], classifier: ProfileClassifier,
+                          memory_manager: MemoryManager, investment_calculator: InvestmentCalculator,
+                          analytics_engine: AnalyticsEngine):
+    """Etapas que dependem do perfil: classificação, depois simulação e estatísticas da coorte"""
+    profile_percentages = await _run_stage(
+        "classificacao",
+        _classify_user(request, user_id, classifier, memory_manager),
+        settings.stage_timeout_classification_seconds,
+        lambda: _classify(request, classifier, None),  # Sem histórico: apenas os dados da requisição
+        degraded
     )
     dominant_profile = max(profile_percentages, key=profile_percentages.get)
 
+    await _record_statistics(request, user, user_id, dominant_profile, analytics_engine)
+    investment_simulation = await _run_stage(
+        "simulacao",
+        _simulate_investment(request, dominant_profile, investment_calculator),
+        settings.stage_timeout_simulation_seconds, None, degraded
+    )
+    return profile_percentages, dominant_profile, investment_simulation
+
+async def _record_statistics(request: UserRequest, user, user_id: str, dominant_profile: str, analytics_engine: AnalyticsEngine):
+    """Enfileira a atualização da coorte (write-behind): escrita que não pode ser cancelada pela metade"""
+    await write_behind.call(
+        analytics_engine.record_user,
+        user_id, user, request.idade, request.renda_mensal, dominant_profile, request.objetivo_financeiro
+    )
+
+def _peer_stage(request: UserRequest, degraded: List[str], analytics_engine: AnalyticsEngine):
+    return _run_stage(
+        "analise_comparativa",
+        analytics_engine.compare_with_peers(request.model_dump()),
+        settings.stage_timeout_peer_analysis_seconds, lambda: dict(PEER_ANALYSIS_FALLBACK), degraded
+    )
+
+def _context_stage(user_id: str, degraded: List[str], memory_manager: MemoryManager):
+    return _run_stage(
+        "contexto",
+        memory_manager.get_conversation_context(user_id),
+        settings.stage_timeout_context_seconds, "", degraded
+    )
+
+async def _simulate_investment(request: UserRequest, dominant_profile: str, investment_calculator: InvestmentCalculator):
+    """Simulação de cenários quando a requisição traz valor e prazo"""
+    if not (request.valor_disponivel_investir and request.tempo_investimento):
+        return None
+    return await investment_calculator.simulate_investment_scenarios(
+        initial=request.valor_disponivel_investir,
+        monthly=request.renda_mensal * 0.2,  # 20% da renda como aporte
+        years=request.tempo_investimento,
+        profile=dominant_profile
+    )
+
+async def _save_interaction(user_id: str, user_data: dict, generated_content: str, dominant_profile: str,
+                            objective: str, memory_manager: MemoryManager, tokens: Optional[dict] = None):
+    """Enfileira a gravação no histórico e a atualização da memória (write-behind, fora do caminho crítico)"""
+    record = history_record(
+        user_id, user_data, generated_content, dominant_profile,
+        simulation=user_data.get("investment_simulation"), tokens=tokens
+    )
+    await write_behind.insert("historico", record)
+
+    # A memória guarda só perfil e objetivo, com a referência ao documento do histórico
+    await write_behind.write("user_memory", memory_manager.memory_update(user_id, {
+        "profile": dominant_profile,
+        "objective": objective,
+        "historico_id": record["_id"]
+    }))
+
+def _sse_event(event: str, data: Any) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False, default=str)}\n\n"
+
+@router.post("/gerar-conteudo", status_code=status.HTTP_201_CREATED)
+async def generate_financial_content(
+    request: UserRequest, 
+    classifier: ProfileClassifier = Depends(),
+    ia_generator: IAGenerator = Depends(get_ia_generator),
+    memory_manager: MemoryManager = Depends(),
+    investment_calculator: InvestmentCalculator = Depends(),
+    analytics_engine: AnalyticsEngine = Depends()
+):
+    """Endpoint principal com todas as funcionalidades inteligentes.
 
-    # 3. Cálculos de investimento se houver dados
-    investment_simulation = None
-    if request.valor_disponivel_investir and request.tempo_investimento:
-        investment_simulation = await investment_calculator.simulate_investment_scenarios(
-            initial=request.valor_disponivel_investir,
-            monthly=request.renda_mensal * 0.2,  # 20% da renda como aporte
-            years=request.tempo_investimento,
-            profile=dominant_profile
-        )
+    Depois do usuário, as etapas independentes rodam em paralelo (perfil -> simulação,
+    análise comparativa e contexto), cada uma com timeout e resultado degradado. As
+    estatísticas da coorte são gravadas em segundo plano.
+    """
+    
+    # 1. Encontrar ou criar usuário (as demais etapas dependem dele)
+    user, user_id = await _find_or_create_user(request)
 
-    # 4. Análise comparativa
-    peer_analysis = await analytics_engine.compare_with_peers(request.model_dump())
+    # 2-4. Classificação e simulação, análise comparativa e contexto de memória, em paralelo
+    degraded = []
+    (profile_percentages, dominant_profile, investment_simulation), peer_analysis, conversation_context = await asyncio.gather(
+        _profile_stages(request, user, user_id, degraded, classifier, memory_manager, investment_calculator, analytics_engine),
+        _peer_stage(request, degraded, analytics_engine),
+        _context_stage(user_id, degraded, memory_manager)
+    )
 
     # 5. Geração de conteúdo com contexto de memória
-    conversation_context = await memory_manager.get_conversation_context(user_id)
     user_data = request.model_dump()
     user_data["investment_simulation"] = investment_simulation
     user_data["peer_analysis"] = peer_analysis
 
+    tokens = {}
     generated_content = await ia_generator.generate_content(
         dominant_profile, 
         user_data, 
         request.objetivo_financeiro,
-        conversation_context
+        conversation_context,
+        usage=tokens
     )
 
-    # 6. Atualizar memória
-    await memory_manager.update_user_memory(user_id, {
-        "request": user_data,
-        "response": generated_content,
-        "profile": dominant_profile,
-        "objective": request.objetivo_financeiro,
-        "dominant_profile": dominant_profile
-    })
-
-    # 7. Salvar histórico
-    history_data = {
-        "user_id": user_id,
-        "request": user_data,
-        "response": generated_content,
-        "investment_simulation": investment_simulation,
-        "peer_analysis": peer_analysis,
-        "timestamp": datetime.now(timezone.utc)
-    }
-    await mongodb_crud.create_document("historico", history_data)
+    # 6. Atualizar memória e salvar histórico
+    await _save_interaction(user_id, user_data, generated_content, dominant_profile, request.objetivo_financeiro, memory_manager, tokens)
 
     return {
         "perfil_investidor": dominant_profile,
@@ -113,25 +190,158 @@ async def generate_financial_content(
         "conteudo_educativo": generated_content,
         "simulacao_investimento": investment_simulation,
         "analise_comparativa": peer_analysis,
+        "etapas_degradadas": degraded,
         "user_id": user_id
     }
 
+@router.post("/gerar-conteudo/stream")
+async def generate_financial_content_stream(
+    request: UserRequest, 
+    classifier: ProfileClassifier = Depends(),
+    ia_generator: IAGenerator = Depends(get_ia_generator),
+    memory_manager: MemoryManager = Depends(),
+    investment_calculator: InvestmentCalculator = Depends(),
+    analytics_engine: AnalyticsEngine = Depends()
+):
+    """Variante em Server-Sent Events do /gerar-conteudo.
+
+    Eventos: perfil, simulacao e analise_comparativa, cada um assim que sua etapa termina (a
+    ordem entre eles varia; identifique-os pelo nome, e simulacao sempre vem depois de perfil),
+    depois texto/paragrafo (conteúdo gerado à medida que chega) e concluido (mesma resposta do
+    endpoint sem streaming).
+    """
+
+    async def events():
+        user, user_id = await _find_or_create_user(request)
+
+        # Todas as etapas começam juntas; a simulação, que depende do perfil, assim que ele é classificado
+        degraded = []
+        profile_task = asyncio.create_task(_run_stage(
+            "classificacao",
+            _classify_user(request, user_id, classifier, memory_manager),
+            settings.stage_timeout_classification_seconds,
+            lambda: _classify(request, classifier, None),
+            degraded
+        ))
+        peer_task = asyncio.create_task(_peer_stage(request, degraded, analytics_engine))
+        context_task = asyncio.create_task(_context_stage(user_id, degraded, memory_manager))
+        tasks = [profile_task, peer_task, context_task]
+        # Cada evento sai quando sua etapa termina, qualquer que seja a ordem
+        pending = {profile_task: "perfil", peer_task: "analise_comparativa"}
+        try:
+            while pending:
+                done, _ = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    event = pending.pop(task)
+                    if event == "perfil":
+                        profile_percentages = task.result()
+                        dominant_profile = max(profile_percentages, key=profile_percentages.get)
+                        yield _sse_event("perfil", {
+                            "perfil_investidor": dominant_profile,
+                            "percentuais_perfil": profile_percentages,
+                            "user_id": user_id
+                        })
+
+                        await _record_statistics(request, user, user_id, dominant_profile, analytics_engine)
+                        simulation_task = asyncio.create_task(_run_stage(
+                            "simulacao",
+                            _simulate_investment(request, dominant_profile, investment_calculator),
+                            settings.stage_timeout_simulation_seconds, None, degraded
+                        ))
+                        tasks.append(simulation_task)
+                        pending[simulation_task] = "simulacao"
+                    elif event == "simulacao":
+                        investment_simulation = task.result()
+                        yield _sse_event("simulacao", investment_simulation)
+                    else:
+                        peer_analysis = task.result()
+                        yield _sse_event("analise_comparativa", peer_analysis)
+
+            conversation_context = await context_task
+        finally:
+            # Cliente desconectado: não deixa etapas rodando sem dono
+            for task in tasks:
+                task.cancel()
+
+        user_data = request.model_dump()
+        user_data["investment_simulation"] = investment_simulation
+        user_data["peer_analysis"] = peer_analysis
+
+        generated_content, tokens = "", None
+        async for event in ia_generator.generate_content_stream(
+            dominant_profile, user_data, request.objetivo_financeiro, conversation_context
+        ):
+            if event["evento"] == "conteudo":
+                generated_content, tokens = event["texto"], event.get("tokens")
+            else:
+                yield _sse_event(event.pop("evento"), event)
+
+        await _save_interaction(user_id, user_data, generated_content, dominant_profile, request.objetivo_financeiro, memory_manager, tokens)
+
+        yield _sse_event("concluido", {
+            "perfil_investidor": dominant_profile,
+            "percentuais_perfil": profile_percentages,
+            "conteudo_educativo": generated_content,
+            "simulacao_investimento": investment_simulation,
+            "analise_comparativa": peer_analysis,
+            "etapas_degradadas": degraded,
+            "user_id": user_id
+        })
+
+    # X-Accel-Buffering desativa o buffer de proxies (nginx) para os eventos chegarem na hora
+    return StreamingResponse(events(), media_type="text/event-stream", headers={
+        "Cache-Control": "no-cache",
+        "X-Accel-Buffering": "no"
+    })
+
 @router.post("/simular-investimento", response_model=InvestmentSimulationResponse)
 async def simulate_investment(request: InvestmentSimulationRequest):
     """Endpoint específico para simulação de investimentos"""
     calculator = InvestmentCalculator()
-    result = await calculator.calculate_compound_interest(
+    result = await calculator.simulate_with_projection(
         request.valor_inicial,
         request.aporte_mensal,
         request.tempo_anos,
         request.taxa_anual
     )
     
-    result["projecao_mensal"] = calculator.generate_monthly_projection(
+    return result
+
+@router.post("/simular-investimento/lote")
+async def simulate_investment_batch(request: InvestmentSimulationBatchRequest):
+    """Simulação de investimentos em lote: cálculo vetorizado com resultados em NDJSON"""
+    calculator = InvestmentCalculator()
+    initial, monthly, years, rate = request.to_columns()
+    results = calculator.calculate_compound_interest_batch(initial, monthly, years, rate)
+    columns = {field: values.tolist() for field, values in results.items()}
+
+    def ndjson_lines(chunk_size: int = 1000):
+        lines = []
+        for i in range(len(initial)):
+            result = {"indice": i, **{field: values[i] for field, values in columns.items()}}
+            if request.incluir_projecao:
+                result["projecao_mensal"] = calculator.generate_monthly_projection(initial[i], monthly[i], years[i], rate[i])
+            lines.append(json.dumps(result))
+            if len(lines) >= chunk_size:
+                yield "\n".join(lines) + "\n"
+                lines = []
+        if lines:
+            yield "\n".join(lines) + "\n"
+
+    return StreamingResponse(ndjson_lines(), media_type="application/x-ndjson")
+
+@router.post("/simular-investimento/monte-carlo")
+async def simulate_investment_monte_carlo(request: MonteCarloSimulationRequest):
+    """Simulação de Monte Carlo com faixas de percentis por ano"""
+    calculator = InvestmentCalculator()
+    result = await calculator.simulate_monte_carlo(
         request.valor_inicial,
         request.aporte_mensal,
         request.tempo_anos,
-        request.taxa_anual
+        request.perfil_risco,
+        n_paths=request.caminhos,
+        seed=request.semente
     )
-    
-    return result
\ No newline at end of file
+    if "erro" in result:
+        raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail=result["erro"])
+    return result
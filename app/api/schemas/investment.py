@@ -1,7 +1,9 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, Field, model_validator
 from typing import Dict, List, Optional
 from datetime import datetime
 
+MAX_BATCH_SIZE = 100_000
+
 class InvestmentSimulationRequest(BaseModel):
     valor_inicial: float
     aporte_mensal: float
@@ -9,6 +11,48 @@ class InvestmentSimulationRequest(BaseModel):
     taxa_anual: float
     perfil_risco: str
 
+class InvestmentSimulationBatchRequest(BaseModel):
+    # Lista de simulações ou, de forma compacta, colunas paralelas com os mesmos campos
+    simulacoes: Optional[List[InvestmentSimulationRequest]] = None
+    valores_iniciais: Optional[List[float]] = None
+    aportes_mensais: Optional[List[float]] = None
+    tempos_anos: Optional[List[int]] = None
+    taxas_anuais: Optional[List[float]] = None
+    incluir_projecao: bool = Field(False, description="Inclui a projeção anual em cada resultado")
+
+    @model_validator(mode="after")
+    def validate_batch(self):
+        columns = [self.valores_iniciais, self.aportes_mensais, self.tempos_anos, self.taxas_anuais]
+        if self.simulacoes is None:
+            if any(column is None for column in columns):
+                raise ValueError('Informe "simulacoes" ou todas as colunas do formato compacto')
+            if len({len(column) for column in columns}) != 1:
+                raise ValueError('As colunas do formato compacto devem ter o mesmo tamanho')
+        elif any(column is not None for column in columns):
+            raise ValueError('Use "simulacoes" ou o formato compacto, não ambos')
+        if len(self.to_columns()[0]) > MAX_BATCH_SIZE:
+            raise ValueError(f'O lote aceita no máximo {MAX_BATCH_SIZE} simulações')
+        return self
+
+    def to_columns(self) -> tuple:
+        """Retorna (valores_iniciais, aportes_mensais, tempos_anos, taxas_anuais)"""
+        if self.simulacoes is not None:
+            return (
+                [s.valor_inicial for s in self.simulacoes],
+                [s.aporte_mensal for s in self.simulacoes],
+                [s.tempo_anos for s in self.simulacoes],
+                [s.taxa_anual for s in self.simulacoes]
+            )
+        return (self.valores_iniciais, self.aportes_mensais, self.tempos_anos, self.taxas_anuais)
+
+class MonteCarloSimulationRequest(BaseModel):
+    valor_inicial: float = Field(..., ge=0)
+    aporte_mensal: float = Field(0, ge=0)
+    tempo_anos: int = Field(..., gt=0, le=50)
+    perfil_risco: str = "moderado"
+    caminhos: Optional[int] = Field(None, gt=0, description="Número de caminhos simulados")
+    semente: Optional[int] = Field(None, ge=0, description="Semente para resultados reproduzíveis")
+
 class InvestmentSimulationResponse(BaseModel):
     valor_final: float
     total_investido: float
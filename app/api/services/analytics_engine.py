@@ -1,26 +1,55 @@
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional
 from datetime import datetime
 from app.api.services import mongodb_crud
-import statistics
+from app.api.services.cohort_stats import CohortStatsStore, COHORT_COLLECTION, get_age_group, income_quartile, histogram_median
+from app.api.services.analytics_snapshot import snapshot
+from app.core.config.settings import settings
+import bisect
 
 class AnalyticsEngine:
+    def __init__(self):
+        self.cohort_stats = CohortStatsStore()
+
+    @staticmethod
+    async def ensure_indexes():
+        """Cria os índices usados pela análise comparativa"""
+        await mongodb_crud.create_index("usuarios", [("idade", 1), ("renda_mensal", 1)])
+        await mongodb_crud.create_index("historico", [("user_id", 1), ("timestamp", -1)])
+        await mongodb_crud.create_index(COHORT_COLLECTION, [("faixa_etaria", 1), ("faixa_renda", 1)], unique=True)
+
+    async def record_user(self, user_id: str, previous_user: Optional[Dict], idade: int, renda: float, perfil: str, objective: str = ""):
+        """Mantém as estatísticas materializadas da coorte atualizadas"""
+        changed = await self.cohort_stats.record_user(user_id, previous_user, idade, renda, perfil, objective)
+        # O snapshot acompanha só as trocas de perfil efetivamente gravadas no banco
+        if changed and settings.analytics_source == "columnar":
+            if previous_user:
+                idade = previous_user.get("idade", idade)
+                renda = previous_user.get("renda_mensal", renda)
+            snapshot.upsert(user_id, idade, renda, perfil)
+
     async def compare_with_peers(self, user_data: Dict[str, Any]) -> Dict[str, Any]:
         """Compara usuário com outros usuários similares"""
         try:
-            similar_users = await self._find_similar_users(user_data)
-            
-            if not similar_users:
+            if settings.analytics_source == "cohort":
+                return await self._compare_with_cohort(user_data)
+            if settings.analytics_source == "columnar":
+                return await self._compare_with_snapshot(user_data)
+
+            stats = await self._peer_statistics(user_data)
+            total = stats["total"][0]["total"] if stats and stats["total"] else 0
+
+            if not total:
                 return {
                     "message": "Dados insuficientes para comparação no momento",
                     "total_peers": 0
                 }
             
             analysis = {
-                "total_peers": len(similar_users),
-                "age_group_comparison": await self._analyze_age_group(similar_users, user_data['idade']),
-                "income_comparison": await self._analyze_income(similar_users, user_data['renda_mensal']),
-                "profile_distribution": await self._analyze_profiles(similar_users),
-                "common_objectives": await self._analyze_objectives(similar_users)
+                "total_peers": total,
+                "age_group_comparison": self._analyze_age_group(stats["idades"], user_data['idade']),
+                "income_comparison": self._analyze_income(stats["rendas"], user_data['renda_mensal']),
+                "profile_distribution": {result["_id"]: result["total"] for result in stats["perfis"]},
+                "common_objectives": await self._analyze_objectives(user_data)
             }
             
             return analysis
@@ -28,104 +57,183 @@ class AnalyticsEngine:
             print(f"Erro na análise comparativa: {e}")
             return {"erro": "Análise comparativa temporariamente indisponível"}
 
-    async def _find_similar_users(self, user_data: Dict, max_diff_age: int = 5, max_diff_income: float = 0.3) -> List[Dict]:
-        """Encontra usuários com idade e renda similares"""
-        try:
-            all_users = await mongodb_crud.find_all_documents("usuarios")
-            
-            similar_users = []
-            for user in all_users:
-                if user.get('_id'):  # Evita comparar com o próprio usuário atual
-                    age_diff = abs(user.get('idade', 0) - user_data['idade'])
-                    income_diff = abs(user.get('renda_mensal', 0) - user_data['renda_mensal']) / max(user_data['renda_mensal'], 1)
-                    
-                    if age_diff <= max_diff_age and income_diff <= max_diff_income:
-                        similar_users.append(user)
-            
-            return similar_users
-        except:
-            return []
+    async def _compare_with_cohort(self, user_data: Dict[str, Any]) -> Dict[str, Any]:
+        """Compara usuário com as estatísticas materializadas da sua coorte"""
+        cohort = await self.cohort_stats.get_cohort(user_data['idade'], user_data['renda_mensal'])
+        if not cohort or not cohort.get("total"):
+            return {
+                "message": "Dados insuficientes para comparação no momento",
+                "total_peers": 0
+            }
 
-    async def _analyze_age_group(self, users: List[Dict], user_age: int) -> Dict:
-        """Analisa distribuição por faixa etária"""
-        try:
-            ages = [user.get('idade', 0) for user in users if user.get('idade')]
-            
-            if not ages:
-                return {"faixa_etaria": self._get_age_group(user_age), "comparacao": "sem dados"}
-            
+        summary = cohort.get("resumo") or {}
+        avg_age, avg_income = summary.get("media_idade", 0), summary.get("media_renda", 0)
+        user_age, user_income = user_data['idade'], user_data['renda_mensal']
+        return {
+            "total_peers": cohort["total"],
+            "age_group_comparison": {
+                "media_idade": round(avg_age, 1),
+                "mediana_idade": summary.get("mediana_idade"),
+                "faixa_etaria": self._get_age_group(user_age),
+                "comparacao": "acima" if user_age > avg_age else "abaixo" if user_age < avg_age else "na media"
+            },
+            "income_comparison": {
+                "media_renda": round(avg_income, 2),
+                "mediana_renda": summary.get("mediana_renda"),
+                "desvio_padrao_renda": round(summary.get("desvio_padrao_renda", 0), 2),
+                "comparacao": "acima" if user_income > avg_income else "abaixo" if user_income < avg_income else "na media",
+                "quartil": income_quartile(user_income, summary.get("quartis_renda"))
+            },
+            "profile_distribution": {perfil: count for perfil, count in cohort.get("perfis", {}).items() if count > 0},
+            "common_objectives": summary.get("objetivos_comuns", [])
+        }
+
+    async def _compare_with_snapshot(self, user_data: Dict[str, Any]) -> Dict[str, Any]:
+        """Compara usuário com os similares usando o snapshot colunar em memória"""
+        user_age, user_income = user_data['idade'], user_data['renda_mensal']
+        stats = snapshot.compare(user_age, user_income)
+        if not stats:
             return {
-                "media_idade": round(statistics.mean(ages), 1),
-                "mediana_idade": statistics.median(ages),
+                "message": "Dados insuficientes para comparação no momento",
+                "total_peers": 0
+            }
+
+        age_comparison = {"faixa_etaria": self._get_age_group(user_age), "comparacao": "sem dados"}
+        if "media_idade" in stats:
+            avg_age = stats["media_idade"]
+            age_comparison = {
+                "media_idade": round(avg_age, 1),
+                "mediana_idade": stats["mediana_idade"],
                 "faixa_etaria": self._get_age_group(user_age),
-                "comparacao": "acima" if user_age > statistics.mean(ages) else "abaixo" if user_age < statistics.mean(ages) else "na media"
+                "comparacao": "acima" if user_age > avg_age else "abaixo" if user_age < avg_age else "na media"
             }
-        except:
-            return {"faixa_etaria": self._get_age_group(user_age), "comparacao": "erro"}
 
-    async def _analyze_income(self, users: List[Dict], user_income: float) -> Dict:
-        """Analisa distribuição de renda"""
-        try:
-            incomes = [user.get('renda_mensal', 0) for user in users if user.get('renda_mensal')]
-            
-            if not incomes:
-                return {"comparacao": "sem dados"}
-            
-            avg_income = statistics.mean(incomes)
-            return {
+        income_comparison = {"comparacao": "sem dados"}
+        if "media_renda" in stats:
+            avg_income = stats["media_renda"]
+            income_comparison = {
                 "media_renda": round(avg_income, 2),
                 "comparacao": "acima" if user_income > avg_income else "abaixo" if user_income < avg_income else "na media",
-                "quartil": self._get_income_quartile(user_income, incomes)
+                "quartil": stats["quartil"]
             }
-        except:
-            return {"comparacao": "erro"}
 
-    async def _analyze_profiles(self, users: List[Dict]) -> Dict:
-        """Analisa distribuição de perfis"""
-        try:
-            # Busca perfis no histórico
-            profiles = []
-            for user in users:
-                historico = await mongodb_crud.find_document("historico", {"user_id": str(user.get('_id'))})
-                if historico and historico.get('perfil_classificado'):
-                    profiles.append(historico.get('perfil_classificado'))
-            
-            profile_count = {}
-            for profile in profiles:
-                profile_count[profile] = profile_count.get(profile, 0) + 1
-            
-            return profile_count
-        except:
-            return {}
+        return {
+            "total_peers": stats["total_peers"],
+            "age_group_comparison": age_comparison,
+            "income_comparison": income_comparison,
+            "profile_distribution": stats["profile_distribution"],
+            "common_objectives": await self._analyze_objectives(user_data)
+        }
+
+    def _peer_query(self, user_data: Dict, max_diff_age: int = 5, max_diff_income: float = 0.3) -> Dict:
+        """Usuários com idade e renda similares: consulta por faixa no índice composto (idade, renda_mensal)"""
+        income_margin = max_diff_income * max(user_data['renda_mensal'], 1)
+        return {
+            "idade": {"$gte": user_data['idade'] - max_diff_age, "$lte": user_data['idade'] + max_diff_age},
+            "renda_mensal": {"$gte": user_data['renda_mensal'] - income_margin, "$lte": user_data['renda_mensal'] + income_margin}
+        }
+
+    async def _peer_statistics(self, user_data: Dict) -> Optional[Dict[str, List[Dict]]]:
+        """Estatísticas dos usuários similares calculadas no servidor, em uma única agregação.
+
+        Nenhum usuário trafega: só o histograma de idades (no máximo 11 valores), a contagem e a
+        média das rendas com a posição da renda do usuário, e a distribuição do último perfil
+        classificado de cada similar, buscado no índice (user_id, timestamp) de `historico`.
+        """
+        pipeline = [
+            {"$match": self._peer_query(user_data)},
+            {"$project": {"idade": 1, "renda_mensal": 1}},
+            {"$facet": {
+                "total": [{"$count": "total"}],
+                "idades": [
+                    {"$match": {"idade": {"$gt": 0}}},
+                    {"$group": {"_id": "$idade", "total": {"$sum": 1}}}
+                ],
+                "rendas": [
+                    {"$match": {"renda_mensal": {"$gt": 0}}},
+                    {"$group": {
+                        "_id": None,
+                        "total": {"$sum": 1},
+                        "media": {"$avg": "$renda_mensal"},
+                        "abaixo": {"$sum": {"$cond": [{"$lt": ["$renda_mensal", user_data['renda_mensal']]}, 1, 0]}}
+                    }}
+                ],
+                "perfis": [
+                    {"$lookup": {
+                        "from": "historico",
+                        "let": {"user_id": {"$toString": "$_id"}},
+                        "pipeline": [
+                            {"$match": {"$expr": {"$eq": ["$user_id", "$$user_id"]}}},
+                            {"$match": {"perfil_classificado": {"$ne": None}}},
+                            {"$sort": {"timestamp": -1}},
+                            {"$limit": 1},
+                            {"$project": {"_id": 0, "perfil_classificado": 1}}
+                        ],
+                        "as": "ultimo"
+                    }},
+                    {"$unwind": "$ultimo"},
+                    {"$group": {"_id": "$ultimo.perfil_classificado", "total": {"$sum": 1}}}
+                ]
+            }}
+        ]
+        results = await mongodb_crud.aggregate("usuarios", pipeline)
+        return results[0] if results else None
 
-    async def _analyze_objectives(self, users: List[Dict]) -> List[str]:
-        """Analisa objetivos comuns"""
+    def _analyze_age_group(self, age_counts: List[Dict], user_age: int) -> Dict:
+        """Analisa distribuição por faixa etária a partir do histograma de idades"""
+        histogram = {str(result["_id"]): result["total"] for result in age_counts}
+        total = sum(histogram.values())
+        if not total:
+            return {"faixa_etaria": self._get_age_group(user_age), "comparacao": "sem dados"}
+
+        avg_age = sum(float(age) * count for age, count in histogram.items()) / total
+        return {
+            "media_idade": round(avg_age, 1),
+            "mediana_idade": histogram_median(histogram),
+            "faixa_etaria": self._get_age_group(user_age),
+            "comparacao": "acima" if user_age > avg_age else "abaixo" if user_age < avg_age else "na media"
+        }
+
+    def _analyze_income(self, income_stats: List[Dict], user_income: float) -> Dict:
+        """Analisa distribuição de renda a partir da contagem, média e posição da renda do usuário"""
+        if not income_stats or not income_stats[0]["total"]:
+            return {"comparacao": "sem dados"}
+
+        stats = income_stats[0]
+        avg_income = stats["media"]
+        return {
+            "media_renda": round(avg_income, 2),
+            "comparacao": "acima" if user_income > avg_income else "abaixo" if user_income < avg_income else "na media",
+            "quartil": self._quartile_from_rank(stats["abaixo"], stats["total"])
+        }
+
+    async def _analyze_objectives(self, user_data: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """Retorna os objetivos mais comuns da coorte (top-5 mantido a cada escrita)"""
         try:
-            objectives = []
-            for user in users:
-                if user.get('objetivo_financeiro'):
-                    objectives.append(user.get('objetivo_financeiro')[:100])  # Limita tamanho
-            
-            return list(set(objectives))[:5]  # Retorna até 5 objetivos únicos
-        except:
+            # Só o resumo: o documento da coorte também guarda os sketches serializados
+            cohort = await self.cohort_stats.get_cohort(
+                user_data['idade'], user_data['renda_mensal'], {"_id": 0, "resumo.objetivos_comuns": 1}
+            )
+            return ((cohort or {}).get("resumo") or {}).get("objetivos_comuns", [])
+        except Exception as e:
+            print(f"Erro ao buscar objetivos da coorte: {e}")
             return []
 
     def _get_age_group(self, age: int) -> str:
-        if age <= 25: return "18-25"
-        elif age <= 35: return "26-35"
-        elif age <= 45: return "36-45"
-        elif age <= 55: return "46-55"
-        else: return "56+"
+        return get_age_group(age)
 
     def _get_income_quartile(self, income: float, incomes: List[float]) -> int:
         if not incomes:
             return 1
         try:
-            sorted_incomes = sorted(incomes)
-            n = len(sorted_incomes)
-            for i, inc in enumerate(sorted_incomes):
-                if income <= inc:
-                    return min(4, (i * 4) // n + 1)
-            return 4
+            # Quantidade de rendas estritamente menores, por busca binária
+            return self._quartile_from_rank(bisect.bisect_left(sorted(incomes), income), len(incomes))
         except:
-            return 1
\ No newline at end of file
+            return 1
+
+    @staticmethod
+    def _quartile_from_rank(below: int, total: int) -> int:
+        """Quartil a partir do número de rendas estritamente menores que a do usuário"""
+        if below >= total:
+            return 4
+        return min(4, (below * 4) // total + 1)
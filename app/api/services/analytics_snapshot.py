@@ -0,0 +1,128 @@
+from typing import Dict, Any, List, Optional
+import asyncio
+import time
+import numpy as np
+from app.api.services import mongodb_crud
+from app.core.config.settings import settings
+
+PROFILE_CODES = {"conservador": 0, "moderado": 1, "agressivo": 2}
+PROFILE_NAMES = {code: name for name, code in PROFILE_CODES.items()}
+
+class ColumnarSnapshot:
+    """Cópia colunar (NumPy) de `usuarios` mantida em memória pelo worker.
+
+    É recarregada inteira por uma tarefa em segundo plano a cada
+    `analytics_snapshot_refresh_seconds` e atualizada incrementalmente pela rota, de modo
+    que a análise comparativa roda como máscaras e reduções vetorizadas, sem consultar o
+    MongoDB. Durante a recarga as requisições continuam lendo as colunas anteriores.
+    """
+
+    def __init__(self):
+        self.idade = np.empty(0, dtype=np.int16)
+        self.renda = np.empty(0, dtype=np.float64)
+        self.perfil = np.empty(0, dtype=np.int8)
+        self._positions: Dict[str, int] = {}
+        self._size = 0
+        self._loaded_at: Optional[float] = None
+        self._pending: Optional[List[tuple]] = None  # Atualizações recebidas durante uma recarga
+
+    @property
+    def size(self) -> int:
+        return self._size
+
+    async def run_refresher(self):
+        """Recarrega o snapshot periodicamente; iniciada no lifespan, nunca por uma requisição"""
+        while True:
+            try:
+                await self.refresh()
+            except Exception as e:
+                print(f"Erro ao recarregar o snapshot de análise: {e}")
+            await asyncio.sleep(settings.analytics_snapshot_refresh_seconds)
+
+    async def refresh(self):
+        """Recarrega todas as colunas a partir de `usuarios` e troca as anteriores ao final"""
+        self._pending = []
+        try:
+            users = await mongodb_crud.find_all_documents(
+                "usuarios", None, {"idade": 1, "renda_mensal": 1, "perfil_classificado": 1}
+            )
+            n = len(users)
+            idade = np.zeros(n, dtype=np.int16)
+            renda = np.zeros(n, dtype=np.float64)
+            perfil = np.full(n, -1, dtype=np.int8)
+            positions = {}
+            for i, user in enumerate(users):
+                idade[i] = user.get("idade") or 0
+                renda[i] = user.get("renda_mensal") or 0
+                perfil[i] = PROFILE_CODES.get(user.get("perfil_classificado"), -1)
+                positions[str(user["_id"])] = i
+
+            self.idade, self.renda, self.perfil = idade, renda, perfil
+            self._positions, self._size = positions, n
+            self._loaded_at = time.monotonic()
+            # Reaplica o que chegou enquanto a coleção era lida
+            for update in self._pending:
+                self._apply(*update)
+        finally:
+            self._pending = None
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "usuarios": self._size,
+            "idade_s": round(time.monotonic() - self._loaded_at, 1) if self._loaded_at is not None else None
+        }
+
+    def upsert(self, user_id: str, idade: int, renda: float, perfil: Optional[str]):
+        """Aplica uma inserção ou mudança de perfil sem recarregar o snapshot"""
+        if self._pending is not None:
+            self._pending.append((user_id, idade, renda, perfil))
+        self._apply(user_id, idade, renda, perfil)
+
+    def _apply(self, user_id: str, idade: int, renda: float, perfil: Optional[str]):
+        position = self._positions.get(user_id)
+        if position is None:
+            if self._size == len(self.idade):
+                capacity = max(16, 2 * len(self.idade))
+                self.idade = np.resize(self.idade, capacity)
+                self.renda = np.resize(self.renda, capacity)
+                self.perfil = np.resize(self.perfil, capacity)
+            position = self._size
+            self._positions[user_id] = position
+            self._size += 1
+            self.idade[position] = idade
+            self.renda[position] = renda
+        self.perfil[position] = PROFILE_CODES.get(perfil, -1)
+
+    def compare(self, user_age: int, user_income: float, max_diff_age: int = 5, max_diff_income: float = 0.3) -> Optional[Dict[str, Any]]:
+        """Estatísticas dos usuários similares calculadas de forma vetorizada"""
+        idade = self.idade[:self._size]
+        renda = self.renda[:self._size]
+        mask = (np.abs(idade - user_age) <= max_diff_age) & \
+            (np.abs(renda - user_income) / max(user_income, 1) <= max_diff_income)
+        total = int(np.count_nonzero(mask))
+        if total == 0:
+            return None
+
+        ages = idade[mask]
+        ages = ages[ages > 0]
+        incomes = renda[mask]
+        incomes = incomes[incomes > 0]
+        profiles = self.perfil[:self._size][mask]
+        counts = np.bincount(profiles[profiles >= 0], minlength=len(PROFILE_CODES))
+
+        result: Dict[str, Any] = {
+            "total_peers": total,
+            "profile_distribution": {PROFILE_NAMES[code]: int(count) for code, count in enumerate(counts) if count}
+        }
+        if ages.size:
+            median_age = float(np.median(ages))
+            result["media_idade"] = float(ages.mean())
+            result["mediana_idade"] = int(median_age) if median_age.is_integer() else median_age
+        if incomes.size:
+            below = int(np.count_nonzero(incomes < user_income))
+            result["media_renda"] = float(incomes.mean())
+            result["quartil"] = 4 if below == incomes.size else min(4, (below * 4) // incomes.size + 1)
+        return result
+
+# Snapshot compartilhado por todas as requisições do worker
+snapshot = ColumnarSnapshot()
@@ -0,0 +1,270 @@
+from typing import Dict, Any, Optional, List
+from datetime import datetime, timezone
+from bson import ObjectId
+from app.api.services import mongodb_crud
+from app.core.utils.sketches import RunningMoments, KLLSketch, SpaceSaving
+from app.core.utils.text_processing import extrair_palavras_chave
+import asyncio
+import sys
+
+COHORT_COLLECTION = "cohort_stats"
+MAX_UPDATE_RETRIES = 5
+OBJECTIVE_TRACKER_CAPACITY = 50  # Contadores de palavras-chave de objetivo por coorte
+
+def get_age_group(age: int) -> str:
+    if age <= 25: return "18-25"
+    elif age <= 35: return "26-35"
+    elif age <= 45: return "36-45"
+    elif age <= 55: return "46-55"
+    else: return "56+"
+
+def get_income_group(income: float) -> str:
+    if income <= 2000: return "ate-2k"
+    elif income <= 5000: return "2k-5k"
+    elif income <= 10000: return "5k-10k"
+    elif income <= 20000: return "10k-20k"
+    else: return "20k+"
+
+def _non_zero(counts: Optional[Dict[str, int]]) -> Dict[str, int]:
+    return {k: v for k, v in (counts or {}).items() if v}
+
+def _differs(stored: Dict[str, Any], rebuilt: Dict[str, Any]) -> bool:
+    """Compara uma coorte armazenada com a recalculada (tolerando arredondamento)"""
+    if stored.get("total") != rebuilt["total"]:
+        return True
+    for field in ("momentos_idade", "momentos_renda"):
+        stored_moments = RunningMoments.from_dict(stored.get(field))
+        rebuilt_moments = RunningMoments.from_dict(rebuilt[field])
+        if stored_moments.n != rebuilt_moments.n or abs(stored_moments.mean - rebuilt_moments.mean) > 0.01:
+            return True
+    return any(_non_zero(stored.get(field)) != _non_zero(rebuilt[field]) for field in ("idades", "perfis"))
+
+def histogram_median(histogram: Optional[Dict[str, int]]) -> Optional[float]:
+    """Mediana exata a partir de um histograma {valor: contagem}"""
+    items = sorted((float(k), v) for k, v in (histogram or {}).items() if v > 0)
+    n = sum(v for _, v in items)
+    if n == 0:
+        return None
+    middle = [(n - 1) // 2, n // 2]
+    values, seen = [], 0
+    for value, count in items:
+        while middle and middle[0] < seen + count:
+            values.append(value)
+            middle.pop(0)
+        seen += count
+    median = sum(values) / 2
+    return int(median) if median.is_integer() else median
+
+def income_quartile(income: float, quartiles: Optional[List[float]]) -> int:
+    """Quartil da renda a partir dos pontos de corte pré-calculados da coorte"""
+    if not quartiles:
+        return 1
+    return 1 + sum(1 for cut in quartiles if cut is not None and cut < income)
+
+def _summary(idades: Dict[str, int], age_moments: RunningMoments, income_moments: RunningMoments, income_sketch: KLLSketch, objectives: SpaceSaving) -> Dict[str, Any]:
+    """Resumo pré-calculado a cada escrita, para leitura em O(1)"""
+    return {
+        "media_idade": age_moments.mean,
+        "mediana_idade": histogram_median(idades),
+        "media_renda": income_moments.mean,
+        "desvio_padrao_renda": income_moments.stddev,
+        "mediana_renda": income_sketch.quantile(0.5),
+        "quartis_renda": income_sketch.quantiles([0.25, 0.5, 0.75]),
+        "objetivos_comuns": [{"objetivo": term, "contagem": count} for term, count in objectives.top(5)]
+    }
+
+class CohortStatsStore:
+    """Estatísticas agregadas por faixa etária e faixa de renda, mantidas incrementalmente"""
+
+    def cohort_key(self, idade: int, renda: float) -> Dict[str, str]:
+        return {"faixa_etaria": get_age_group(idade), "faixa_renda": get_income_group(renda)}
+
+    async def get_cohort(self, idade: int, renda: float, projection: Optional[Dict[str, Any]] = None) -> Optional[Dict[str, Any]]:
+        """Lê as estatísticas da coorte do usuário (só os campos de `projection`, se informado)"""
+        return await mongodb_crud.find_document(COHORT_COLLECTION, self.cohort_key(idade, renda), projection)
+
+    async def record_user(self, user_id: str, previous_user: Optional[Dict], idade: int, renda: float, perfil: str, objective: str = "") -> bool:
+        """Atualiza a coorte a cada requisição: inserção de usuário, mudança de perfil e objetivo.
+
+        Chamada pela gravação em segundo plano (write-behind), fora do caminho da requisição.
+        `previous_user` é lido no início da requisição e pode estar defasado quando a escrita
+        roda; por isso a mudança de perfil é decidida pelo próprio banco. Retorna se o perfil
+        do usuário foi alterado por esta chamada.
+        """
+        try:
+            # A coorte de um usuário existente é a dos dados já gravados (a rota não altera a renda)
+            if previous_user:
+                idade = previous_user.get("idade", idade)
+                renda = previous_user.get("renda_mensal", renda)
+            key = self.cohort_key(idade, renda)
+
+            # Troca condicional: só conta a transição se o documento ainda tinha outro perfil
+            replaced = await mongodb_crud.find_one_and_update(
+                "usuarios",
+                {"_id": ObjectId(user_id), "perfil_classificado": {"$ne": perfil}},
+                {"$set": {"perfil_classificado": perfil}},
+                {"perfil_classificado": 1}
+            )
+            changed = replaced is not None
+            previous_profile = replaced.get("perfil_classificado") if changed else None
+
+            increments: Dict[str, int] = {}
+            if previous_user is None:
+                increments = {"total": 1, f"idades.{idade}": 1}
+            if changed:
+                increments[f"perfis.{perfil}"] = 1
+                if previous_profile:
+                    increments[f"perfis.{previous_profile}"] = -1
+
+            applied = await self._update_cohort(key, increments)
+            if not applied and changed:
+                # Contadores não gravados: devolve o perfil anterior para a próxima requisição recontar
+                await mongodb_crud.update_document(
+                    "usuarios", {"_id": ObjectId(user_id), "perfil_classificado": perfil}, {"perfil_classificado": previous_profile}
+                )
+                return False
+
+            keywords = extrair_palavras_chave(objective or "")
+            if applied and (previous_user is None or keywords):
+                await self._update_sketches(key, (idade, renda) if previous_user is None else None, keywords)
+            return changed
+        except Exception as e:
+            print(f"Erro ao atualizar estatísticas da coorte: {e}")
+            return False
+
+    async def _update_cohort(self, key: Dict[str, str], increments: Dict[str, int]) -> bool:
+        """Aplica os contadores (total, idades, perfis) em um $inc atômico; retorna se foram gravados"""
+        if not increments:
+            return True
+        try:
+            await mongodb_crud.apply_update(COHORT_COLLECTION, key, {"$inc": increments}, upsert=True)
+            return True
+        except Exception as e:
+            print(f"Erro ao atualizar contadores da coorte {key}: {e}")
+            return False
+
+    async def _update_sketches(self, key: Dict[str, str], new_user: Optional[tuple], keywords: List[str]):
+        """Atualiza momentos, sketch de renda, top-k de objetivos e resumo via controle otimista de versão.
+
+        Se os conflitos persistirem, só os sketches ficam sem este usuário (os contadores
+        já foram gravados); `rebuild` os recalcula.
+        """
+        for _ in range(MAX_UPDATE_RETRIES):
+            cohort = await mongodb_crud.find_document(COHORT_COLLECTION, key)
+            if cohort is None:
+                await mongodb_crud.apply_update(COHORT_COLLECTION, key, {"$setOnInsert": {"versao": 0}}, upsert=True)
+                continue
+
+            idades = dict(cohort.get("idades") or {})
+            age_moments = RunningMoments.from_dict(cohort.get("momentos_idade"))
+            income_moments = RunningMoments.from_dict(cohort.get("momentos_renda"))
+            income_sketch = KLLSketch.from_dict(cohort.get("sketch_renda"))
+            objectives = SpaceSaving.from_dict(cohort.get("objetivos_topk"), OBJECTIVE_TRACKER_CAPACITY)
+            if new_user:
+                idade, renda = new_user
+                age_moments.add(idade)
+                income_moments.add(renda)
+                income_sketch.add(renda)
+            for keyword in keywords:
+                objectives.add(keyword)
+
+            modified = await mongodb_crud.apply_update(COHORT_COLLECTION, {**key, "versao": cohort.get("versao")}, {
+                "$inc": {"versao": 1},
+                "$set": {
+                    "momentos_idade": age_moments.to_dict(),
+                    "momentos_renda": income_moments.to_dict(),
+                    "sketch_renda": income_sketch.to_dict(),
+                    "objetivos_topk": objectives.to_dict(),
+                    "resumo": _summary(idades, age_moments, income_moments, income_sketch, objectives),
+                    "atualizado_em": datetime.now(timezone.utc)
+                }
+            })
+            if modified:
+                return
+        print(f"Aviso: conflito persistente ao atualizar os sketches da coorte {key}; rode o rebuild para recalculá-los")
+
+    async def rebuild(self, write: bool = True) -> Dict[str, Any]:
+        """Recalcula todas as coortes a partir de `usuarios` e `historico`"""
+        pipeline = [
+            {"$match": {"perfil_classificado": {"$ne": None}}},
+            {"$project": {"_id": 0, "user_id": 1, "timestamp": 1, "perfil_classificado": 1}},
+            {"$sort": {"user_id": 1, "timestamp": -1}},
+            {"$group": {"_id": "$user_id", "perfil": {"$first": "$perfil_classificado"}}}
+        ]
+        latest_profiles = {doc["_id"]: doc["perfil"] for doc in await mongodb_crud.aggregate("historico", pipeline)}
+        requests = await mongodb_crud.find_all_documents("historico", None, {"user_id": 1, "request.objetivo_financeiro": 1})
+        objectives_by_user: Dict[str, List[str]] = {}
+        for entry in requests:
+            objective = (entry.get("request") or {}).get("objetivo_financeiro")
+            if objective:
+                objectives_by_user.setdefault(entry.get("user_id"), []).append(objective)
+        users = await mongodb_crud.find_all_documents("usuarios", None, {"idade": 1, "renda_mensal": 1, "perfil_classificado": 1})
+
+        cohorts: Dict[tuple, Dict[str, Any]] = {}
+        backfill: Dict[str, List[ObjectId]] = {}
+        now = datetime.now(timezone.utc)
+        for user in users:
+            idade, renda = user.get("idade"), user.get("renda_mensal")
+            if not idade or not renda:
+                continue
+            key = self.cohort_key(idade, renda)
+            cohort = cohorts.setdefault((key["faixa_etaria"], key["faixa_renda"]), {
+                **key, "total": 0, "idades": {}, "perfis": {}, "versao": 0, "atualizado_em": now,
+                "momentos_idade": RunningMoments(), "momentos_renda": RunningMoments(), "sketch_renda": KLLSketch(),
+                "objetivos_topk": SpaceSaving(OBJECTIVE_TRACKER_CAPACITY)
+            })
+            cohort["total"] += 1
+            cohort["idades"][str(idade)] = cohort["idades"].get(str(idade), 0) + 1
+            cohort["momentos_idade"].add(idade)
+            cohort["momentos_renda"].add(renda)
+            cohort["sketch_renda"].add(renda)
+            for objective in objectives_by_user.get(str(user["_id"]), []):
+                for keyword in extrair_palavras_chave(objective):
+                    cohort["objetivos_topk"].add(keyword)
+
+            perfil = latest_profiles.get(str(user["_id"]))
+            if perfil:
+                cohort["perfis"][perfil] = cohort["perfis"].get(perfil, 0) + 1
+                if user.get("perfil_classificado") != perfil:
+                    backfill.setdefault(perfil, []).append(user["_id"])
+
+        for cohort in cohorts.values():
+            cohort["resumo"] = _summary(cohort["idades"], cohort["momentos_idade"], cohort["momentos_renda"], cohort["sketch_renda"], cohort["objetivos_topk"])
+            for field in ("momentos_idade", "momentos_renda", "sketch_renda", "objetivos_topk"):
+                cohort[field] = cohort[field].to_dict()
+
+        rebuilt = list(cohorts.values())
+        stored = await mongodb_crud.find_all_documents(COHORT_COLLECTION)
+        stored_by_key = {(doc.get("faixa_etaria"), doc.get("faixa_renda")): doc for doc in stored}
+        divergent = [
+            key for key, cohort in cohorts.items()
+            if key not in stored_by_key or _differs(stored_by_key[key], cohort)
+        ]
+        divergent += [key for key in stored_by_key if key not in cohorts]
+
+        if write:
+            await mongodb_crud.delete_documents(COHORT_COLLECTION, {})
+            if rebuilt:
+                await mongodb_crud.create_documents(COHORT_COLLECTION, rebuilt)
+            for perfil, ids in backfill.items():
+                await mongodb_crud.update_documents("usuarios", {"_id": {"$in": ids}}, {"perfil_classificado": perfil})
+
+        return {
+            "coortes": len(rebuilt),
+            "usuarios": sum(cohort["total"] for cohort in rebuilt),
+            "coortes_divergentes": len(divergent),
+            "perfis_corrigidos": sum(len(ids) for ids in backfill.values())
+        }
+
+async def _main(write: bool):
+    from app.database.connection import connect_to_mongo, close_mongo_connection
+    await connect_to_mongo()
+    try:
+        report = await CohortStatsStore().rebuild(write=write)
+        print(f"Reconstrução das coortes: {report}")
+    finally:
+        await close_mongo_connection()
+
+if __name__ == "__main__":
+    # python -m app.api.services.cohort_stats [--check]
+    asyncio.run(_main(write="--check" not in sys.argv))
@@ -0,0 +1,152 @@
+from typing import Optional, Dict, Any
+from datetime import datetime, timedelta, timezone
+import hashlib
+import json
+import re
+from app.api.services import mongodb_crud
+from app.api.services.cohort_stats import get_age_group, get_income_group
+from app.core.config.settings import settings
+from app.core.utils.cache import LRUCache
+from app.core.utils.text_processing import normalizar_texto
+
+CONTENT_CACHE_COLLECTION = "content_cache"
+# O nome do usuário é trocado por marcadores no conteúdo armazenado e restaurado na leitura
+NAME_PLACEHOLDER = "[[NOME]]"
+FIRST_NAME_PLACEHOLDER = "[[PRIMEIRO_NOME]]"
+
+def _anonymize(content: str, user_name: str) -> str:
+    user_name = (user_name or "").strip()
+    if not user_name:
+        return content
+    content = re.sub(rf"\b{re.escape(user_name)}\b", NAME_PLACEHOLDER, content)
+    first_name = user_name.split()[0]
+    return re.sub(rf"\b{re.escape(first_name)}\b", FIRST_NAME_PLACEHOLDER, content)
+
+def _personalize(content: str, user_name: str) -> str:
+    # Nomes só com espaços passam pela validação do schema (min_length) e viram "usuário"
+    user_name = (user_name or "").strip() or "usuário"
+    return content.replace(NAME_PLACEHOLDER, user_name).replace(FIRST_NAME_PLACEHOLDER, user_name.split()[0])
+
+AGE_GROUP_DESCRIPTIONS = {
+    "18-25": "entre 18 e 25 anos", "26-35": "entre 26 e 35 anos", "36-45": "entre 36 e 45 anos",
+    "46-55": "entre 46 e 55 anos", "56+": "56 anos ou mais"
+}
+INCOME_GROUP_DESCRIPTIONS = {
+    "ate-2k": "até R$ 2.000", "2k-5k": "entre R$ 2.000 e R$ 5.000", "5k-10k": "entre R$ 5.000 e R$ 10.000",
+    "10k-20k": "entre R$ 10.000 e R$ 20.000", "20k+": "acima de R$ 20.000"
+}
+
+def banded_user_data(user_data: dict) -> dict:
+    """Idade e renda descritas pelas faixas da chave do cache, para o prompt de conteúdo compartilhável"""
+    return {
+        **user_data,
+        "idade": AGE_GROUP_DESCRIPTIONS[get_age_group(user_data.get("idade") or 0)],
+        "renda_mensal": INCOME_GROUP_DESCRIPTIONS[get_income_group(user_data.get("renda_mensal") or 0)]
+    }
+
+def content_fingerprint(profile: str, user_data: dict, objective: str, conversation_context: str = "") -> str:
+    """Chave do conteúdo gerado a partir do que o prompt efetivamente usa, com idade e renda em faixas"""
+    parts = {
+        "perfil": profile,
+        "faixa_etaria": get_age_group(user_data.get("idade") or 0),
+        "faixa_renda": get_income_group(user_data.get("renda_mensal") or 0),
+        "objetivo": " ".join(re.findall(r"[a-z0-9]+", normalizar_texto(objective or ""))),
+        "contexto": hashlib.sha256(conversation_context.encode()).hexdigest() if conversation_context else ""
+    }
+    return hashlib.sha256(json.dumps(parts, sort_keys=True).encode()).hexdigest()
+
+class InMemoryContentCacheBackend:
+    """Cache local do worker: LRU limitado com TTL"""
+
+    def __init__(self, max_size: int, ttl: float):
+        self._cache = LRUCache(max_size, ttl)
+
+    async def get(self, key: str) -> Optional[str]:
+        return self._cache.get(key)
+
+    async def set(self, key: str, content: str):
+        self._cache.set(key, content)
+
+    def stats(self) -> Dict[str, Any]:
+        return self._cache.stats()
+
+class MongoContentCacheBackend:
+    """Cache compartilhado entre workers em uma coleção com índice TTL"""
+
+    def __init__(self, ttl: float):
+        self.ttl = ttl
+
+    async def ensure_indexes(self):
+        await mongodb_crud.create_index(CONTENT_CACHE_COLLECTION, [("expira_em", 1)], expireAfterSeconds=0)
+
+    async def get(self, key: str) -> Optional[str]:
+        document = await mongodb_crud.find_document(
+            CONTENT_CACHE_COLLECTION, {"_id": key, "expira_em": {"$gt": datetime.now(timezone.utc)}}
+        )
+        return document.get("conteudo") if document else None
+
+    async def set(self, key: str, content: str):
+        now = datetime.now(timezone.utc)
+        await mongodb_crud.apply_update(CONTENT_CACHE_COLLECTION, {"_id": key}, {
+            "$set": {"conteudo": content, "criado_em": now, "expira_em": now + timedelta(seconds=self.ttl)}
+        }, upsert=True)
+
+    def stats(self) -> Dict[str, Any]:
+        return {}
+
+class ContentCache:
+    """Cache de conteúdo educativo gerado, com backend configurável e métricas de acerto"""
+
+    def __init__(self, backend=None):
+        self.backend = backend
+        self.hits = 0
+        self.misses = 0
+        self.bypasses = 0
+
+    def key_for(self, profile: str, user_data: dict, objective: str, conversation_context: str = "") -> Optional[str]:
+        """Chave da requisição, ou None se ela não deve usar o cache"""
+        if self.backend is None:
+            return None
+        if conversation_context and settings.content_cache_bypass_with_context:
+            self.bypasses += 1
+            return None
+        return content_fingerprint(profile, user_data, objective, conversation_context)
+
+    async def get(self, key: str, user_name: str) -> Optional[str]:
+        try:
+            content = await self.backend.get(key)
+        except Exception as e:
+            print(f"Erro ao ler cache de conteúdo: {e}")
+            content = None
+        if content is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return _personalize(content, user_name)
+
+    async def set(self, key: str, content: str, user_name: str):
+        try:
+            await self.backend.set(key, _anonymize(content, user_name))
+        except Exception as e:
+            print(f"Erro ao gravar cache de conteúdo: {e}")
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "backend": settings.content_cache_backend,
+            "acertos": self.hits,
+            "falhas": self.misses,
+            "ignoradas_com_contexto": self.bypasses,
+            "taxa_acerto": round(self.hits / lookups, 4) if lookups else None,
+            "armazenamento": self.backend.stats() if self.backend else {}
+        }
+
+def _create_backend():
+    if settings.content_cache_backend == "memory":
+        return InMemoryContentCacheBackend(settings.content_cache_size, settings.content_cache_ttl_seconds)
+    if settings.content_cache_backend == "mongo":
+        return MongoContentCacheBackend(settings.content_cache_ttl_seconds)
+    return None
+
+# Cache compartilhado pelo processo
+content_cache = ContentCache(_create_backend())
@@ -1,41 +1,207 @@
 import os
-import google.generativeai as genai
 import re
+from typing import Optional, AsyncIterator, Dict, Any, List
+from fastapi import HTTPException, Request, status
 from app.core.config.settings import settings
+from app.core.utils.concurrency import ConcurrencyLimiter
+from app.api.services.content_cache import content_cache, banded_user_data
+from app.api.services.llm_backends import LLMClient, create_backend
+from app.api.services.prompt_budget import estimate_tokens, truncate_to_tokens, token_usage
+
+# Limita as chamadas simultâneas ao modelo em todo o processo
+llm_limiter = ConcurrencyLimiter(settings.llm_max_concurrency)
+
+async def get_ia_generator(request: Request) -> "IAGenerator":
+    """Instância única do gerador, criada no lifespan e compartilhada por todas as requisições do processo.
+
+    Dependência assíncrona: o FastAPI a executa no event loop, sem passar pelo threadpool.
+    """
+    generator = getattr(request.app.state, "ia_generator", None)
+    if generator is None:
+        raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail="Serviço de IA indisponível")
+    return generator
+
+class ParagraphSplitter:
+    """Divide em parágrafos, à medida que chega, o texto produzido em streaming pelo modelo.
+
+    `feed` e `finish` retornam eventos: ("texto", índice, trecho) para cada pedaço emitido
+    e ("paragrafo", índice, texto) quando um parágrafo termina (linha em branco).
+    """
+
+    def __init__(self, max_paragraphs: int = 3):
+        self.max_paragraphs = max_paragraphs
+        self.paragraphs: List[str] = []
+        self._current = ""
+        self._pending = ""
+
+    def feed(self, text: str) -> List[tuple]:
+        events = []
+        parts = re.split(r'\n\s*\n', self._pending + text)
+        for part in parts[:-1]:
+            events += self._emit(part)
+            events += self._close()
+        # Espaços finais ficam retidos: podem ser o início de uma linha em branco
+        tail = parts[-1]
+        content = tail.rstrip()
+        events += self._emit(content)
+        self._pending = tail[len(content):]
+        return events
+
+    def finish(self) -> List[tuple]:
+        self._pending = ""
+        return self._close()
+
+    def _emit(self, text: str) -> List[tuple]:
+        if len(self.paragraphs) >= self.max_paragraphs:
+            return []
+        if not self._current:
+            text = text.lstrip()
+        if not text:
+            return []
+        self._current += text
+        return [("texto", len(self.paragraphs), text)]
+
+    def _close(self) -> List[tuple]:
+        paragraph = self._current.strip()
+        self._current = ""
+        if not paragraph or len(self.paragraphs) >= self.max_paragraphs:
+            return []
+        self.paragraphs.append(paragraph)
+        return [("paragrafo", len(self.paragraphs) - 1, paragraph)]
 
 class IAGenerator:
     def __init__(self):
-        self.api_key = settings.gemini_api_key
-        genai.configure(api_key=self.api_key)
+        # Backend principal (e reserva, para hedge) escolhidos em Settings
+        fallback = create_backend(settings.llm_fallback_backend) if settings.llm_fallback_backend else None
+        self.llm = LLMClient(create_backend(settings.llm_backend), fallback)
 
     async def check_connection(self) -> bool:
-        """Verifica a conexão com a API da IA (Google Gemini)."""
-        return bool(self.api_key)
+        """Verifica se o backend de IA configurado tem credenciais."""
+        return self.llm.is_configured()
 
-    async def generate_content(self, profile: str, user_data: dict, objective: str, conversation_context: str = "") -> str:
-        """Gera conteúdo educativo personalizado usando o Google Gemini AI."""
+    async def generate_content(self, profile: str, user_data: dict, objective: str, conversation_context: str = "",
+                               usage: Optional[Dict[str, Any]] = None) -> str:
+        """Gera conteúdo educativo personalizado usando o backend de IA configurado.
+
+        Se `usage` for informado, recebe a contagem de tokens (estimada) do prompt e da resposta.
+        """
         if not await self.check_connection():
-            return "A conexão com o serviço de IA não pôde ser estabelecida. Verifique a configuração da chave de API (GEMINI_API_KEY)."
+            return "A conexão com o serviço de IA não pôde ser estabelecida. Verifique a configuração do backend de IA (LLM_BACKEND e a chave de API correspondente)."
+
+        # Requisições equivalentes (mesmo perfil, faixas e objetivo) reaproveitam o conteúdo gerado
+        user_name = user_data.get("nome", "")
+        cache_key = content_cache.key_for(profile, user_data, objective, conversation_context)
+        if cache_key:
+            cached = await content_cache.get(cache_key, user_name)
+            if cached is not None:
+                if usage is not None:
+                    usage.update(self._usage(0, 0), cache=True)
+                return cached
 
-        prompt = self._build_prompt(profile, user_data, objective, conversation_context)
+        prompt = self._build_prompt(profile, self._prompt_user_data(user_data, cache_key), objective, conversation_context)
 
         try:
-            model = genai.GenerativeModel("models/gemini-2.5-flash")
-            response = model.generate_content(prompt)
-            
-            conteudo_bruto = response.text.strip()
+            # Chamada assíncrona: o event loop segue atendendo outras requisições
+            async with llm_limiter:
+                conteudo_bruto = (await self.llm.generate(prompt)).strip()
+
+            tokens = self._record_usage(prompt, conteudo_bruto)
+            if usage is not None:
+                usage.update(tokens)
+
             paragrafos = self._format_to_three_paragraphs(conteudo_bruto)
-            return "\n\n".join(paragrafos)
+            conteudo = "\n\n".join(paragrafos)
+            if cache_key:
+                await content_cache.set(cache_key, conteudo, user_name)
+            return conteudo
 
         except Exception as e:
-            print(f"Erro ao gerar conteúdo com Gemini: {e}")
+            print(f"Erro ao gerar conteúdo com o modelo de IA: {e!r}")
             return f"Ocorreu um erro ao gerar o conteúdo financeiro: {str(e)}. Por favor, tente novamente mais tarde."
 
+    async def generate_content_stream(self, profile: str, user_data: dict, objective: str, conversation_context: str = "") -> AsyncIterator[Dict[str, Any]]:
+        """Versão em streaming de `generate_content`.
+
+        Emite eventos {"evento": "texto" | "paragrafo", ...} à medida que o modelo responde e,
+        por último, {"evento": "conteudo", "texto": ...} com o texto final em 3 parágrafos.
+        """
+        if not await self.check_connection():
+            yield {"evento": "conteudo", "texto": "A conexão com o serviço de IA não pôde ser estabelecida. Verifique a configuração do backend de IA (LLM_BACKEND e a chave de API correspondente)."}
+            return
+
+        user_name = user_data.get("nome", "")
+        cache_key = content_cache.key_for(profile, user_data, objective, conversation_context)
+        if cache_key:
+            cached = await content_cache.get(cache_key, user_name)
+            if cached is not None:
+                for indice, paragrafo in enumerate(cached.split("\n\n")):
+                    yield {"evento": "paragrafo", "indice": indice, "texto": paragrafo}
+                yield {"evento": "conteudo", "texto": cached, "tokens": {**self._usage(0, 0), "cache": True}}
+                return
+
+        prompt = self._build_prompt(profile, self._prompt_user_data(user_data, cache_key), objective, conversation_context)
+        splitter = ParagraphSplitter()
+        recebido = []
+
+        try:
+            async with llm_limiter:
+                async for chunk in self.llm.stream(prompt):
+                    recebido.append(chunk)
+                    for evento in splitter.feed(chunk):
+                        yield self._stream_event(evento)
+            for evento in splitter.finish():
+                yield self._stream_event(evento)
+
+            # O texto final passa pela mesma normalização da versão sem streaming
+            paragrafos = self._format_to_three_paragraphs("\n\n".join(splitter.paragraphs))
+            conteudo = "\n\n".join(paragrafos)
+            if cache_key:
+                await content_cache.set(cache_key, conteudo, user_name)
+            yield {"evento": "conteudo", "texto": conteudo, "tokens": self._record_usage(prompt, "".join(recebido))}
+
+        except Exception as e:
+            print(f"Erro ao gerar conteúdo com o modelo de IA: {e!r}")
+            yield {"evento": "conteudo", "texto": f"Ocorreu um erro ao gerar o conteúdo financeiro: {str(e)}. Por favor, tente novamente mais tarde."}
+
+    @staticmethod
+    def _prompt_user_data(user_data: dict, cache_key: Optional[str]) -> dict:
+        # Conteúdo que vai para o cache é servido a toda a faixa: o prompt não leva idade e renda exatas
+        return banded_user_data(user_data) if cache_key else user_data
+
+    @staticmethod
+    def _usage(prompt_tokens: int, completion_tokens: int) -> Dict[str, Any]:
+        return {"tokens_prompt": prompt_tokens, "tokens_resposta": completion_tokens}
+
+    def _record_usage(self, prompt: str, completion: str) -> Dict[str, Any]:
+        tokens = self._usage(estimate_tokens(prompt), estimate_tokens(completion))
+        token_usage.record(tokens["tokens_prompt"], tokens["tokens_resposta"])
+        return tokens
+
+    @staticmethod
+    def _stream_event(evento: tuple) -> Dict[str, Any]:
+        tipo, indice, texto = evento
+        if tipo == "texto":
+            return {"evento": "texto", "paragrafo": indice, "delta": texto}
+        return {"evento": "paragrafo", "indice": indice, "texto": texto}
+
     def _build_prompt(self, profile: str, user_data: dict, objective: str, conversation_context: str = "") -> str:
+        """Constrói o prompt respeitando `prompt_token_budget`: o excesso sai do contexto de conversa."""
+        prompt = self._render_prompt(profile, user_data, objective, conversation_context)
+        excess = estimate_tokens(prompt) - settings.prompt_token_budget
+        if excess > 0 and conversation_context:
+            token_usage.record_truncation()
+            conversation_context = truncate_to_tokens(conversation_context, estimate_tokens(conversation_context) - excess)
+            prompt = self._render_prompt(profile, user_data, objective, conversation_context)
+        return prompt
+
+    def _render_prompt(self, profile: str, user_data: dict, objective: str, conversation_context: str = "") -> str:
         """Constrói o prompt para a IA com base nos dados do usuário e perfil."""
         name = user_data.get("nome", "usuário")
         age = user_data.get("idade", "não informada")
         income = user_data.get("renda_mensal", "não informada")
+        # Valores exatos ou, com o cache de conteúdo, a descrição da faixa
+        age = f"{age} anos" if isinstance(age, (int, float)) else age
+        income = f"R$ {income:.2f}" if isinstance(income, (int, float)) else income
 
         # Build conversation context section
         context_section = ""
@@ -46,8 +212,8 @@ class IAGenerator:
 
 DADOS PESSOAIS:
 - Nome: {name}
-- Idade: {age} anos
-- Renda mensal: R$ {income:.2f}
+- Idade: {age}
+- Renda mensal: {income}
 - Perfil classificado: {profile}
 - Objetivo específico: {objective}
 
@@ -0,0 +1,160 @@
+from typing import Dict, Any, Optional, List
+from datetime import datetime, timezone
+from bson import ObjectId, encode
+from pymongo import ReplaceOne, UpdateOne
+from app.api.services import mongodb_crud
+import asyncio
+import sys
+import zlib
+
+HISTORY_COLLECTION = "historico"
+MEMORY_COLLECTION = "user_memory"
+SCHEMA_VERSION = 2
+MIGRATION_BATCH_SIZE = 500
+
+# Campos injetados em user_data pela rota; já gravados à parte (simulação) ou recalculáveis (análise)
+DERIVED_REQUEST_FIELDS = ("investment_simulation", "peer_analysis")
+
+def compress_text(text: str) -> bytes:
+    return zlib.compress((text or "").encode("utf-8"), 9)
+
+def decompress_text(value) -> str:
+    """Texto de um registro: comprimido (esquema compacto) ou em texto puro (registros antigos)"""
+    if value is None:
+        return ""
+    if isinstance(value, str):
+        return value
+    return zlib.decompress(bytes(value)).decode("utf-8")
+
+def compact_simulation(simulation: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+    """Cenários sem a projeção ano a ano, que é recalculável a partir dos parâmetros"""
+    if not simulation:
+        return simulation
+    return {key: value for key, value in simulation.items() if key != "projecao_mensal"}
+
+def history_record(user_id: str, request: Dict[str, Any], response: str, profile: str,
+                   simulation: Optional[Dict[str, Any]] = None, tokens: Optional[Dict[str, Any]] = None,
+                   timestamp: Optional[datetime] = None) -> Dict[str, Any]:
+    """Documento de `historico` no esquema compacto; o `_id` já vem definido para ser referenciado"""
+    return {
+        "_id": ObjectId(),
+        "versao_esquema": SCHEMA_VERSION,
+        "user_id": user_id,
+        "request": {key: value for key, value in request.items() if key not in DERIVED_REQUEST_FIELDS},
+        "resposta_z": compress_text(response),
+        "simulacao": compact_simulation(simulation),
+        "perfil_classificado": profile,
+        "tokens": tokens,
+        "timestamp": timestamp or datetime.now(timezone.utc)
+    }
+
+def memory_interaction(profile: Optional[str], objective: Optional[str], historico_id: Optional[ObjectId],
+                       timestamp: datetime) -> Dict[str, Any]:
+    """Entrada de `user_memory.conversation_history`: só o que classificação e contexto leem"""
+    return {"timestamp": timestamp, "profile": profile, "objective": objective, "historico_id": historico_id}
+
+def read_response(record: Dict[str, Any]) -> str:
+    """Texto gerado de um documento de `historico`, em qualquer versão do esquema"""
+    if "resposta_z" in record:
+        return decompress_text(record["resposta_z"])
+    return record.get("response") or ""
+
+def _compact_history_document(document: Dict[str, Any]) -> Dict[str, Any]:
+    request = document.get("request") or {}
+    return {
+        **history_record(
+            document.get("user_id"),
+            request,
+            document.get("response") or "",
+            document.get("perfil_classificado"),
+            document.get("investment_simulation") or request.get("investment_simulation"),
+            document.get("tokens"),
+            document.get("timestamp")
+        ),
+        "_id": document["_id"]
+    }
+
+def _compact_memory_history(history: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    # Entradas antigas não tinham a referência ao histórico
+    return [
+        memory_interaction(entry.get("profile"), entry.get("objective"), entry.get("historico_id"), entry.get("timestamp"))
+        for entry in history
+    ]
+
+async def migrate(write: bool = True) -> Dict[str, Any]:
+    """Reescreve `historico` e `user_memory` no esquema compacto e mede a redução de tamanho.
+
+    Os documentos são lidos pelo cursor e gravados em lotes de `MIGRATION_BATCH_SIZE` à medida
+    que são lidos. As atualizações são condicionais: um documento alterado depois de lido (uma
+    interação registrada durante a migração) não é sobrescrito e fica para a próxima execução.
+    """
+    return {
+        HISTORY_COLLECTION: await _migrate_collection(
+            HISTORY_COLLECTION, {"versao_esquema": {"$ne": SCHEMA_VERSION}}, _history_rewrite, write
+        ),
+        MEMORY_COLLECTION: await _migrate_collection(MEMORY_COLLECTION, None, _memory_rewrite, write)
+    }
+
+def _history_rewrite(document: Dict[str, Any]) -> tuple:
+    compact = _compact_history_document(document)
+    return compact, ReplaceOne({"_id": document["_id"], "versao_esquema": document.get("versao_esquema")}, compact)
+
+def _memory_rewrite(document: Dict[str, Any]) -> tuple:
+    history = _compact_memory_history(document.get("conversation_history") or [])
+    # Só grava se nenhuma interação foi registrada desde a leitura (o $push incrementa versao)
+    condition = {"_id": document["_id"], "versao": document.get("versao"), "last_interaction": document.get("last_interaction")}
+    compact = {**document, "conversation_history": history}
+    # Contadores por redação de objetivo, que não são mais mantidos
+    compact["preferences"] = {k: v for k, v in (document.get("preferences") or {}).items() if k != "objective_counts"}
+    update = {"$set": {"conversation_history": history}, "$unset": {"preferences.objective_counts": ""}}
+    return compact, UpdateOne(condition, update)
+
+async def _migrate_collection(collection: str, query: Optional[Dict[str, Any]], rewrite, write: bool) -> Dict[str, Any]:
+    count = before = after = skipped = 0
+    operations = []
+
+    async def flush():
+        nonlocal skipped
+        if write and operations:
+            result = await mongodb_crud.bulk_write(collection, operations)
+            skipped += len(operations) - result.matched_count
+        operations.clear()
+
+    async for document in mongodb_crud.iterate_documents(collection, query, batch_size=MIGRATION_BATCH_SIZE):
+        compact, operation = rewrite(document)
+        count += 1
+        before += len(encode(document))
+        after += len(encode(compact))
+        operations.append(operation)
+        if len(operations) >= MIGRATION_BATCH_SIZE:
+            await flush()
+    await flush()
+    return {**_size_report(count, before, after), "alterados_durante_migracao": skipped}
+
+def _size_report(count: int, before: int, after: int) -> Dict[str, Any]:
+    return {
+        "documentos": count,
+        "bytes_antes": before,
+        "bytes_depois": after,
+        "media_antes": round(before / count) if count else 0,
+        "media_depois": round(after / count) if count else 0,
+        "reducao_percentual": round(100 * (1 - after / before), 1) if before else 0.0
+    }
+
+async def _main(write: bool):
+    from app.database.connection import connect_to_mongo, close_mongo_connection
+    await connect_to_mongo()
+    try:
+        report = await migrate(write=write)
+        for collection, sizes in report.items():
+            print(f"{collection}: {sizes}")
+        if any(sizes["alterados_durante_migracao"] for sizes in report.values()):
+            print("Documentos alterados durante a migração foram preservados; execute-a novamente para compactá-los.")
+        if not write:
+            print("Nada foi gravado (--check).")
+    finally:
+        await close_mongo_connection()
+
+if __name__ == "__main__":
+    # python -m app.api.services.interaction_records [--check]
+    asyncio.run(_main(write="--check" not in sys.argv))
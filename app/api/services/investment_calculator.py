@@ -1,6 +1,97 @@
-import math
-from typing import List, Dict, Any
+import numpy as np
+import asyncio
+import secrets
+import copy
+import multiprocessing
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Dict, Any, Optional
 from app.api.services.selic_api import SelicAPI, MockSelicAPI
+from app.core.config.settings import settings
+from app.core.utils.cache import LRUCache
+from app.core.utils.concurrency import ConcurrencyLimiter
+
+# Retorno médio e volatilidade anuais (%) de cada perfil na simulação de Monte Carlo
+PROFILE_RISK = {
+    "conservador": (8.0, 3.0),
+    "moderado": (12.0, 10.0),
+    "agressivo": (18.0, 25.0)
+}
+PERCENTILES = [5, 25, 50, 75, 95]
+
+_process_pool: Optional[ProcessPoolExecutor] = None
+# Simulações de Monte Carlo em execução ao mesmo tempo no processo (as demais esperam a vez)
+monte_carlo_limiter = ConcurrencyLimiter(settings.monte_carlo_max_concurrency)
+
+# Resultados de simulação memorizados, compartilhados pela rota principal e por /simular-investimento
+simulation_cache = LRUCache(settings.simulation_cache_size)
+_selic_snapshot: Optional[float] = None
+
+def _sync_selic_snapshot(selic: float):
+    """Invalida o cache de simulações quando a taxa Selic muda"""
+    global _selic_snapshot
+    if selic != _selic_snapshot:
+        simulation_cache.clear()
+        _selic_snapshot = selic
+
+def _normalize_params(initial: float, monthly: float, years: int) -> tuple:
+    return (round(float(initial), 2), round(float(monthly), 2), int(years))
+
+def _get_process_pool() -> ProcessPoolExecutor:
+    global _process_pool
+    if _process_pool is None:
+        # "spawn": o processo principal tem threads (motor/pymongo) e um fork herdaria locks delas
+        _process_pool = ProcessPoolExecutor(
+            max_workers=settings.monte_carlo_workers,
+            mp_context=multiprocessing.get_context("spawn")
+        )
+    return _process_pool
+
+def shutdown_process_pool():
+    """Encerra o pool de processos da simulação de Monte Carlo"""
+    global _process_pool
+    if _process_pool is not None:
+        _process_pool.shutdown(cancel_futures=True)
+        _process_pool = None
+
+def _monte_carlo_chunks(initial: float, monthly: float, years: int, mean_rate: float, volatility: float,
+                        n_paths: int, seed: int, chunk_size: int, chunk_indices: List[int], deadline: float,
+                        out: Optional[np.ndarray] = None) -> np.ndarray:
+    """Simula os blocos indicados (consecutivos) e retorna o valor de cada caminho ao fim de cada ano.
+
+    O resultado tem uma linha por ano e uma coluna por caminho dos blocos; com `out` (execução
+    em thread), os valores são gravados direto nele. Cada bloco tem seu próprio gerador derivado
+    de (seed, índice do bloco), então o resultado é o mesmo onde quer que os blocos rodem.
+    Passado o `deadline` (time.time()), interrompe com TimeoutError em vez de seguir até o fim.
+    """
+    # Retornos mensais log-normais com a média e a volatilidade anuais do perfil
+    sigma = volatility / 100 / np.sqrt(12)
+    mu = np.log1p(mean_rate / 100) / 12 - sigma ** 2 / 2
+    sizes = [min(chunk_size, n_paths - index * chunk_size) for index in chunk_indices]
+    if out is None:
+        out = np.empty((years, sum(sizes)), dtype=np.float64)
+    offset = 0
+    for index, size in zip(chunk_indices, sizes):
+        rng = np.random.default_rng(np.random.SeedSequence(seed, spawn_key=(index,)))
+        values = np.full(size, initial, dtype=np.float64)
+        for year in range(years):
+            if time.time() > deadline:
+                raise TimeoutError("tempo limite da simulação de Monte Carlo")
+            growth = np.exp(rng.normal(mu, sigma, size=(size, 12)))
+            for month in range(12):
+                values = values * growth[:, month] + monthly
+            out[year, offset:offset + size] = values
+        offset += size
+    return out
+
+def _future_value(initial, monthly, months, rate):
+    """Valor futuro em forma fechada (anuidade postecipada); aceita escalares ou arrays NumPy"""
+    monthly_rate = np.asarray(rate, dtype=np.float64) / 12 / 100
+    growth = np.power(1 + monthly_rate, months)
+    # Com taxa zero a anuidade degenera para o número de meses
+    safe_rate = np.where(monthly_rate == 0, 1.0, monthly_rate)
+    annuity = np.where(monthly_rate == 0, months, (growth - 1) / safe_rate)
+    return initial * growth + monthly * annuity
 
 class InvestmentCalculator:
     def __init__(self):
@@ -12,24 +103,9 @@ class InvestmentCalculator:
     async def calculate_compound_interest(self, initial: float, monthly: float, years: int, rate: float) -> Dict[str, Any]:
         """Calcula juros compostos com aportes mensais"""
         try:
-            monthly_rate = rate / 12 / 100
             months = years * 12
-            
-            future_value = initial * math.pow(1 + monthly_rate, months)
-            
-            for month in range(months):
-                future_value += monthly * math.pow(1 + monthly_rate, months - month - 1)
-            
-            total_invested = initial + (monthly * months)
-            interest_earned = future_value - total_invested
-
-            return {
-                "valor_final": round(future_value, 2),
-                "total_investido": round(total_invested, 2),
-                "juros_acumulados": round(interest_earned, 2),
-                "taxa_anual": rate,
-                "meses": months
-            }
+            future_value = float(_future_value(initial, monthly, months, rate))
+            return self._format_result(future_value, initial, monthly, months, rate)
         except Exception as e:
             print(f"Erro no cálculo de juros: {e}")
             return {
@@ -40,64 +116,195 @@ class InvestmentCalculator:
                 "meses": years * 12
             }
 
+    def calculate_compound_interest_batch(self, initial, monthly, years, rate) -> Dict[str, np.ndarray]:
+        """Calcula juros compostos para arrays de (inicial, aporte, anos, taxa) em uma única chamada vetorizada"""
+        initial, monthly, years, rate = np.broadcast_arrays(
+            np.asarray(initial, dtype=np.float64),
+            np.asarray(monthly, dtype=np.float64),
+            np.asarray(years, dtype=np.int64),
+            np.asarray(rate, dtype=np.float64)
+        )
+        months = years * 12
+        future_value = _future_value(initial, monthly, months, rate)
+        total_invested = initial + monthly * months
+        return {
+            "valor_final": np.round(future_value, 2),
+            "total_investido": np.round(total_invested, 2),
+            "juros_acumulados": np.round(future_value - total_invested, 2),
+            "taxa_anual": rate,
+            "meses": months
+        }
+
+    def _format_result(self, future_value: float, initial: float, monthly: float, months: int, rate: float) -> Dict[str, Any]:
+        total_invested = initial + (monthly * months)
+        return {
+            "valor_final": round(future_value, 2),
+            "total_investido": round(total_invested, 2),
+            "juros_acumulados": round(future_value - total_invested, 2),
+            "taxa_anual": rate,
+            "meses": months
+        }
+
+    def _metrics(self, result: Dict[str, Any]) -> Dict[str, float]:
+        """Indicadores derivados de um resultado de juros compostos"""
+        invested = result["total_investido"]
+        return {
+            "taxa_anual": result["taxa_anual"],
+            "meses": result["meses"],
+            "rentabilidade_total_percentual": round(100 * result["juros_acumulados"] / invested, 2) if invested else 0.0,
+            "multiplicador_capital": round(result["valor_final"] / invested, 4) if invested else 0.0
+        }
+
     async def simulate_investment_scenarios(self, initial: float, monthly: float, years: int, profile: str) -> Dict[str, Any]:
         """Simula investimentos baseado no perfil"""
         try:
-            # Taxas baseadas no perfil
+            # Taxas baseadas no perfil, em % a.a. como a Selic e _future_value
             profile_rates = {
-                "conservador": 0.08,  # 8% ao ano (Selic + CDI)
-                "moderado": 0.12,     # 12% ao ano
-                "agressivo": 0.18     # 18% ao ano
+                "conservador": 8.0,
+                "moderado": 12.0,
+                "agressivo": 18.0
             }
             
-            base_rate = profile_rates.get(profile, 0.10)
-            
-            # Obtém taxa Selic atual para comparação
-            current_selic = await self.selic_api.get_current_selic() or 0.1175
-            
-            scenarios = {}
+            base_rate = profile_rates.get(profile, 10.0)
             
-            # Cenário do perfil
-            scenarios["perfil"] = await self.calculate_compound_interest(initial, monthly, years, base_rate)
-            
-            # Cenário otimista
-            scenarios["otimista"] = await self.calculate_compound_interest(initial, monthly, years, base_rate * 1.25)
-            
-            # Cenário pessimista
-            scenarios["pessimista"] = await self.calculate_compound_interest(initial, monthly, years, base_rate * 0.75)
+            # Obtém taxa Selic atual (% a.a.) para comparação, sem esperar pela rede
+            current_selic = await self.selic_api.get_current_selic() or settings.selic_fallback_rate
+            _sync_selic_snapshot(current_selic)
+
+            key = ("cenarios", *_normalize_params(initial, monthly, years), profile, current_selic)
+            cached = simulation_cache.get(key)
+            if cached is not None:
+                return copy.deepcopy(cached)
             
-            # Cenário Selic (conservador)
-            scenarios["selic"] = await self.calculate_compound_interest(initial, monthly, years, current_selic * 100)
+            # Cenários perfil, otimista, pessimista e Selic calculados em uma única passada
+            names = ["perfil", "otimista", "pessimista", "selic"]
+            rates = [base_rate, base_rate * 1.25, base_rate * 0.75, current_selic]
+            months = years * 12
+            future_values = _future_value(initial, monthly, months, np.array(rates))
+
+            scenarios = {
+                name: self._format_result(float(value), initial, monthly, months, rate)
+                for name, value, rate in zip(names, future_values, rates)
+            }
             
-            scenarios["taxa_selic_atual"] = current_selic * 100
+            scenarios["taxa_selic_atual"] = current_selic
             scenarios["projecao_mensal"] = self.generate_monthly_projection(initial, monthly, years, base_rate)
             
-            return scenarios
+            simulation_cache.set(key, scenarios)
+            return copy.deepcopy(scenarios)
             
         except Exception as e:
             print(f"Erro na simulação de investimentos: {e}")
             return {"erro": "Não foi possível simular os investimentos"}
 
+    async def simulate_with_projection(self, initial: float, monthly: float, years: int, rate: float) -> Dict[str, Any]:
+        """Juros compostos com projeção anual, memorizados no cache de simulações"""
+        key = ("simulacao", *_normalize_params(initial, monthly, years), round(rate, 6), _selic_snapshot)
+        cached = simulation_cache.get(key)
+        if cached is not None:
+            return copy.deepcopy(cached)
+
+        result = await self.calculate_compound_interest(initial, monthly, years, rate)
+        result["projecao_mensal"] = self.generate_monthly_projection(initial, monthly, years, rate)
+        result["metricas"] = self._metrics(result)
+        simulation_cache.set(key, result)
+        return copy.deepcopy(result)
+
+    async def simulate_monte_carlo(self, initial: float, monthly: float, years: int, profile: str,
+                                   n_paths: Optional[int] = None, seed: Optional[int] = None) -> Dict[str, Any]:
+        """Simula caminhos de retornos mensais e retorna faixas de percentis (P5 a P95) por ano.
+
+        Memória: os percentis exatos precisam do valor anual de todos os caminhos, em um array de
+        anos x caminhos x 8 bytes (no limite de 200k caminhos e 50 anos, ~80 MB). Os blocos são
+        gravados nele à medida que terminam, sem cópia extra para juntá-los (no pool de processos,
+        mais o resultado de um grupo em trânsito). `monte_carlo_max_paths` limita esse custo por
+        requisição e `monte_carlo_max_concurrency` o número de simulações simultâneas.
+        """
+        try:
+            n_paths = min(n_paths or settings.monte_carlo_paths, settings.monte_carlo_max_paths)
+            seed = seed if seed is not None else secrets.randbits(32)
+            mean_rate, volatility = PROFILE_RISK.get(profile, PROFILE_RISK["moderado"])
+            # O prazo vale também para a espera por vaga e é conferido pelos próprios blocos
+            deadline = time.time() + settings.monte_carlo_timeout_seconds
+            yearly = await asyncio.wait_for(
+                self._simulate_paths(initial, monthly, years, mean_rate, volatility, n_paths, seed, deadline),
+                timeout=settings.monte_carlo_timeout_seconds
+            )
+
+            # Os percentis de cada ano reordenam a própria linha em vez de copiá-la
+            bands = np.percentile(yearly, PERCENTILES, axis=1, overwrite_input=True)
+            return {
+                "caminhos": n_paths,
+                "semente": seed,
+                "retorno_medio_anual": mean_rate,
+                "volatilidade_anual": volatility,
+                "percentis": [
+                    {
+                        "ano": year + 1,
+                        **{f"p{p}": round(float(bands[i, year]), 2) for i, p in enumerate(PERCENTILES)},
+                        "total_investido": initial + (monthly * (year + 1) * 12)
+                    }
+                    for year in range(years)
+                ]
+            }
+        except asyncio.TimeoutError:
+            print(f"Simulação de Monte Carlo excedeu {settings.monte_carlo_timeout_seconds}s")
+            return {"erro": "A simulação de Monte Carlo excedeu o tempo limite"}
+        except Exception as e:
+            print(f"Erro na simulação de Monte Carlo: {e}")
+            return {"erro": "Não foi possível executar a simulação de Monte Carlo"}
+
+    async def _simulate_paths(self, initial: float, monthly: float, years: int, mean_rate: float, volatility: float,
+                              n_paths: int, seed: int, deadline: float) -> np.ndarray:
+        """Distribui os blocos de caminhos entre thread ou processos e junta os valores anuais"""
+        chunk_size = settings.monte_carlo_chunk_size
+        chunk_count = (n_paths + chunk_size - 1) // chunk_size
+        args = (initial, monthly, years, mean_rate, volatility, n_paths, seed, chunk_size)
+        loop = asyncio.get_running_loop()
+        async with monte_carlo_limiter:
+            yearly = np.empty((years, n_paths), dtype=np.float64)
+            # Lotes pequenos rodam em uma thread, gravando direto no array final, sem bloquear o event loop
+            if n_paths < settings.monte_carlo_process_threshold:
+                await loop.run_in_executor(None, _monte_carlo_chunks, *args, list(range(chunk_count)), deadline, yearly)
+                return yearly
+
+            # Lotes grandes: grupos de blocos consecutivos no pool de processos, copiados ao terminar.
+            # Um cancelamento (timeout) cancela os grupos ainda não iniciados; os demais param no prazo.
+            executor = _get_process_pool()
+            groups = [group.tolist() for group in np.array_split(np.arange(chunk_count), settings.monte_carlo_workers) if len(group)]
+            futures = [loop.run_in_executor(executor, _monte_carlo_chunks, *args, group, deadline) for group in groups]
+
+            async def collect(future, start: int):
+                result = await future
+                yearly[:, start:start + result.shape[1]] = result
+
+            try:
+                await asyncio.gather(*(collect(future, group[0] * chunk_size) for future, group in zip(futures, groups)))
+            finally:
+                for future in futures:
+                    future.cancel()
+            return yearly
+
     def generate_monthly_projection(self, initial: float, monthly: float, years: int, rate: float) -> List[Dict[str, float]]:
         """Gera projeção ano a ano"""
         try:
             monthly_rate = rate / 12 / 100
-            months = years * 12
-            projection = []
+            year_numbers = np.arange(1, years + 1)
+            growth = np.power(1 + monthly_rate, year_numbers * 12)
+            # Aporte no início de cada mês (anuidade antecipada), como na projeção mês a mês
+            if monthly_rate == 0:
+                values = initial + monthly * year_numbers * 12
+            else:
+                values = initial * growth + monthly * (1 + monthly_rate) * (growth - 1) / monthly_rate
             
-            current_value = initial
-            
-            for year in range(1, years + 1):
-                for month in range(12):
-                    current_value = (current_value + monthly) * (1 + monthly_rate)
-                
-                projection.append({
-                    "ano": year,
-                    "valor_acumulado": round(current_value, 2),
+            return [
+                {
+                    "ano": int(year),
+                    "valor_acumulado": round(float(value), 2),
                     "total_investido": initial + (monthly * year * 12)
-                })
-            
-            return projection
+                }
+                for year, value in zip(year_numbers.tolist(), values)
+            ]
         except Exception as e:
             print(f"Erro na projeção mensal: {e}")
             return []
\ No newline at end of file
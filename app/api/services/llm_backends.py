@@ -0,0 +1,272 @@
+from typing import AsyncIterator, Optional, Dict, Any
+from abc import ABC, abstractmethod
+from collections import deque
+import asyncio
+import hashlib
+import random
+import re
+import time
+import google.generativeai as genai
+from app.core.config.settings import settings
+
+class LLMBackend(ABC):
+    """Interface dos backends de modelo de linguagem.
+
+    `generate` devolve o texto completo; `stream` devolve o texto em pedaços.
+    """
+
+    name = "base"
+
+    def __init__(self, timeout: float):
+        self.timeout = timeout
+
+    def is_configured(self) -> bool:
+        return True
+
+    @abstractmethod
+    async def generate(self, prompt: str) -> str:
+        ...
+
+    async def stream(self, prompt: str) -> AsyncIterator[str]:
+        yield await self.generate(prompt)
+
+class GeminiBackend(LLMBackend):
+    name = "gemini"
+
+    def __init__(self):
+        super().__init__(settings.gemini_timeout_seconds)
+        self.api_key = settings.gemini_api_key
+        genai.configure(api_key=self.api_key)
+        # Handle do modelo criado uma vez e reutilizado (mantém o transporte aberto)
+        self.model = genai.GenerativeModel(settings.gemini_model)
+
+    def is_configured(self) -> bool:
+        return bool(self.api_key)
+
+    async def generate(self, prompt: str) -> str:
+        response = await self.model.generate_content_async(prompt)
+        return response.text
+
+    async def stream(self, prompt: str) -> AsyncIterator[str]:
+        response = await self.model.generate_content_async(prompt, stream=True)
+        async for chunk in response:
+            yield chunk.text
+
+class OpenAIBackend(LLMBackend):
+    """Qualquer API compatível com a de chat completions da OpenAI (OpenAI, vLLM, Ollama, etc.)"""
+
+    name = "openai"
+
+    def __init__(self):
+        super().__init__(settings.openai_timeout_seconds)
+        from openai import AsyncOpenAI  # Dependência necessária apenas para este backend
+        self.api_key = settings.openai_api_key
+        self.client = AsyncOpenAI(api_key=self.api_key or "-", base_url=settings.openai_base_url)
+
+    def is_configured(self) -> bool:
+        return bool(self.api_key or settings.openai_base_url)
+
+    async def generate(self, prompt: str) -> str:
+        response = await self.client.chat.completions.create(
+            model=settings.openai_model,
+            messages=[{"role": "user", "content": prompt}]
+        )
+        return response.choices[0].message.content or ""
+
+    async def stream(self, prompt: str) -> AsyncIterator[str]:
+        response = await self.client.chat.completions.create(
+            model=settings.openai_model,
+            messages=[{"role": "user", "content": prompt}],
+            stream=True
+        )
+        async for chunk in response:
+            if chunk.choices and chunk.choices[0].delta.content:
+                yield chunk.choices[0].delta.content
+
+class LocalStubBackend(LLMBackend):
+    """Backend local e determinístico para testes de carga e benchmarks, sem consumir cota.
+
+    Espera `latency` segundos antes do primeiro token e depois emite `tokens_per_second`.
+    O texto depende apenas do prompt.
+    """
+
+    name = "stub"
+
+    def __init__(self, latency: Optional[float] = None, tokens_per_second: Optional[float] = None):
+        super().__init__(settings.stub_timeout_seconds)
+        self.latency = settings.stub_latency_seconds if latency is None else latency
+        self.tokens_per_second = settings.stub_tokens_per_second if tokens_per_second is None else tokens_per_second
+
+    def _text(self, prompt: str) -> str:
+        seed = int.from_bytes(hashlib.sha256(prompt.encode()).digest()[:8], "big")
+        rng = random.Random(seed)
+        profile = re.search(r"Perfil classificado: (.+)", prompt)
+        objective = re.search(r"Objetivo específico: (.+)", prompt)
+        profile = profile.group(1).strip() if profile else "moderado"
+        objective = objective.group(1).strip() if objective else "seus objetivos"
+        temas = ["reserva de emergência", "diversificação", "juros compostos", "renda fixa", "inflação", "liquidez"]
+        rng.shuffle(temas)
+        return "\n\n".join([
+            f"Para o perfil {profile}, conceitos como {temas[0]} e {temas[1]} são a base de boas decisões. "
+            "Entender risco e retorno ajuda a escolher produtos adequados. Comece pelo que você já conhece.",
+            f"Para {objective}, defina prazo, valor e aportes mensais. Considere {temas[2]} no planejamento. "
+            "Revise o plano periodicamente e ajuste os aportes quando a renda mudar.",
+            f"Acompanhe {temas[3]} e {temas[4]} para não perder poder de compra. "
+            "Registre seus gastos e automatize os investimentos. O próximo passo é montar um orçamento mensal."
+        ])
+
+    async def generate(self, prompt: str) -> str:
+        return "".join([token async for token in self.stream(prompt)])
+
+    async def stream(self, prompt: str) -> AsyncIterator[str]:
+        await asyncio.sleep(self.latency)
+        tokens = re.findall(r"\S+\s*|\s+", self._text(prompt))
+        delay = 1 / self.tokens_per_second if self.tokens_per_second > 0 else 0
+        for token in tokens:
+            if delay:
+                await asyncio.sleep(delay)
+            yield token
+
+BACKENDS = {
+    "gemini": GeminiBackend,
+    "openai": OpenAIBackend,
+    "stub": LocalStubBackend
+}
+
+def create_backend(name: str) -> LLMBackend:
+    try:
+        return BACKENDS[name]()
+    except KeyError:
+        raise ValueError(f"Backend de IA desconhecido: {name}")
+
+class LatencyTracker:
+    """Latências recentes de um backend, para estimar o percentil usado no hedge"""
+
+    def __init__(self, window: int = 200):
+        self._samples = deque(maxlen=window)
+
+    def record(self, seconds: float):
+        self._samples.append(seconds)
+
+    def percentile(self, q: float) -> Optional[float]:
+        if not self._samples:
+            return None
+        ordered = sorted(self._samples)
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+    def __len__(self) -> int:
+        return len(self._samples)
+
+class LLMClient:
+    """Chama o backend principal com timeout e, opcionalmente, faz hedge no backend reserva.
+
+    Hedge: se o principal não responder até o p95 das suas latências recentes, uma segunda
+    requisição vai para o reserva e vence a primeira resposta. Sem amostras suficientes, o
+    prazo é `llm_hedge_default_delay_seconds`. No streaming, o reserva só é usado se o
+    principal falhar antes do primeiro pedaço.
+    """
+
+    def __init__(self, primary: LLMBackend, fallback: Optional[LLMBackend] = None):
+        self.primary = primary
+        self.fallback = fallback
+        self.latencies = {primary.name: LatencyTracker()}
+        if fallback:
+            self.latencies.setdefault(fallback.name, LatencyTracker())
+        self.hedges = 0
+        self.hedge_wins = 0
+        self.fallbacks = 0
+
+    def is_configured(self) -> bool:
+        return self.primary.is_configured() or bool(self.fallback and self.fallback.is_configured())
+
+    def hedge_delay(self) -> float:
+        tracker = self.latencies[self.primary.name]
+        if len(tracker) < settings.llm_hedge_min_samples:
+            return settings.llm_hedge_default_delay_seconds
+        return tracker.percentile(0.95)
+
+    async def _call(self, backend: LLMBackend, prompt: str) -> str:
+        started = time.perf_counter()
+        try:
+            text = await asyncio.wait_for(backend.generate(prompt), backend.timeout)
+        except (asyncio.CancelledError, asyncio.TimeoutError):
+            # Chamadas canceladas pelo hedge ou expiradas também entram (como limite inferior);
+            # sem elas o p95 veria só as respostas rápidas e cairia a cada hedge
+            self.latencies[backend.name].record(time.perf_counter() - started)
+            raise
+        self.latencies[backend.name].record(time.perf_counter() - started)
+        return text
+
+    async def generate(self, prompt: str) -> str:
+        if self.fallback is None:
+            return await self._call(self.primary, prompt)
+
+        primary = asyncio.create_task(self._call(self.primary, prompt))
+        pending = {primary}
+        # Tudo dentro do try: se quem chamou for cancelado (timeout da etapa, cliente desconectado),
+        # nenhuma requisição fica rodando sem dono, ocupando o backend e o limitador de concorrência
+        try:
+            done, pending = await asyncio.wait(pending, timeout=self.hedge_delay())
+            if done and not primary.exception():
+                return primary.result()
+
+            if done:
+                self.fallbacks += 1
+            else:
+                self.hedges += 1
+            hedge = asyncio.create_task(self._call(self.fallback, prompt))
+            pending.add(hedge)
+            error = primary.exception() if done else None
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if task is hedge and primary in pending:
+                            self.hedge_wins += 1
+                        return task.result()
+                    error = task.exception()
+            raise error
+        finally:
+            for task in pending:
+                task.cancel()
+
+    async def stream(self, prompt: str) -> AsyncIterator[str]:
+        """O timeout do backend vale para a resposta inteira, como em `generate`, não só para o primeiro pedaço"""
+        loop = asyncio.get_running_loop()
+        backends = [self.primary] + ([self.fallback] if self.fallback else [])
+        for position, backend in enumerate(backends):
+            deadline = loop.time() + backend.timeout
+            chunks = backend.stream(prompt)
+            try:
+                try:
+                    first = await asyncio.wait_for(chunks.__anext__(), backend.timeout)
+                except StopAsyncIteration:
+                    return
+                except Exception:
+                    if position == len(backends) - 1:
+                        raise
+                    self.fallbacks += 1
+                    continue
+                yield first
+                while True:
+                    try:
+                        chunk = await asyncio.wait_for(chunks.__anext__(), max(0.0, deadline - loop.time()))
+                    except StopAsyncIteration:
+                        return
+                    yield chunk
+            finally:
+                await chunks.aclose()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "backend": self.primary.name,
+            "reserva": self.fallback.name if self.fallback else None,
+            "hedges": self.hedges,
+            "hedges_vencedores": self.hedge_wins,
+            "fallbacks": self.fallbacks,
+            "prazo_hedge_s": round(self.hedge_delay(), 3) if self.fallback else None,
+            "p95_s": {
+                name: round(tracker.percentile(0.95), 3) if len(tracker) else None
+                for name, tracker in self.latencies.items()
+            }
+        }
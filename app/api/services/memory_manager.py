@@ -1,66 +1,173 @@
-from typing import Dict, List, Any, Optional
+from typing import Dict, Any, Optional
 from datetime import datetime
+import asyncio
+import copy
+from pymongo import UpdateOne
 from app.api.services import mongodb_crud
 from app.core.config.settings import settings
+from app.api.services.prompt_budget import compact_history
+from app.api.services.interaction_records import memory_interaction
+from app.core.utils.cache import LRUCache
+
+MEMORY_COLLECTION = "user_memory"
+
+class MemoryCache:
+    """Cache LRU+TTL dos documentos de memória, compartilhado pelas requisições do worker.
+
+    Write-through: cada interação registrada é aplicada também à cópia em cache, que passa a
+    refletir a gravação antes mesmo de o write-behind levá-la ao banco.
+
+    Consistência entre workers: o documento tem `versao` (incrementada a cada interação) e
+    `last_interaction`. Com `memory_cache_validate`, um acerto só é usado depois de conferir esses
+    dois campos no banco, em uma consulta coberta pelo índice (o histórico não trafega):
+    - iguais: a cópia local está atual;
+    - versão local maior: a gravação deste worker ainda está na fila, a cópia local vale;
+    - caso contrário outro worker gravou depois, e a entrada é descartada e relida.
+    Sem validação (um único worker), a defasagem fica limitada pelo TTL. Se uma gravação na fila
+    falhar, a cópia local também só é corrigida pelo TTL.
+    """
+
+    def __init__(self, max_size: int, ttl: float, validate: bool):
+        self._cache = LRUCache(max_size, ttl)
+        self.validate = validate
+        self.validations = 0
+        self.stale = 0
+
+    async def get(self, user_id: str) -> Optional[Dict[str, Any]]:
+        memory = self._cache.get(user_id)
+        if memory is None or not self.validate:
+            return memory
+        self.validations += 1
+        try:
+            stamp = await mongodb_crud.find_document(
+                MEMORY_COLLECTION, {"user_id": user_id}, {"_id": 0, "versao": 1, "last_interaction": 1}
+            ) or {}
+        except Exception as e:
+            print(f"Erro ao validar memória em cache: {e}")
+            return memory
+        cached_version, stored_version = memory.get("versao", 0), stamp.get("versao", 0)
+        if cached_version > stored_version or (
+            cached_version == stored_version and memory.get("last_interaction") == stamp.get("last_interaction")
+        ):
+            return memory
+        self.stale += 1
+        self._cache.invalidate(user_id)
+        return None
+
+    def set(self, user_id: str, memory: Dict[str, Any]):
+        self._cache.set(user_id, memory)
+
+    def invalidate(self, user_id: str):
+        self._cache.invalidate(user_id)
+
+    def apply(self, user_id: str, memory: Optional[Dict[str, Any]], update: Dict[str, Any]):
+        """Aplica à cópia local a mesma atualização enviada ao banco ($push/$slice, $set, $inc)"""
+        memory = copy.deepcopy(memory) if memory else {"user_id": user_id, **update.get("$setOnInsert", {})}
+        for field, push in update.get("$push", {}).items():
+            memory[field] = (list(memory.get(field) or []) + push["$each"])[push["$slice"]:]
+        memory.update(update.get("$set", {}))
+        for path, amount in update.get("$inc", {}).items():
+            *parents, leaf = path.split(".")
+            target = memory
+            for parent in parents:
+                target = target.setdefault(parent, {})
+            target[leaf] = target.get(leaf, 0) + amount
+        self._cache.set(user_id, memory)
+
+    def stats(self) -> Dict[str, Any]:
+        stats = self._cache.stats()
+        lookups = stats["acertos"] + stats["falhas"]
+        return {
+            **stats,
+            "validacao": self.validate,
+            "validacoes": self.validations,
+            "obsoletas": self.stale,
+            "taxa_acerto_valida": round((stats["acertos"] - self.stale) / lookups, 4) if lookups else None
+        }
+
+# Cache compartilhado pelo processo
+memory_cache = MemoryCache(settings.memory_cache_size, settings.memory_cache_ttl_seconds, settings.memory_cache_validate)
 
 class MemoryManager:
+    """Memória do usuário com escopo de requisição (uma instância por requisição, via Depends).
+
+    O documento de cada usuário é lido (do cache ou do banco) uma única vez e compartilhado pela
+    classificação e pelo contexto, inclusive quando essas etapas rodam em paralelo. A atualização
+    não lê o documento: é um upsert atômico, aplicado também ao cache (write-through).
+    """
+
     def __init__(self):
         self.max_history = settings.max_conversation_history
+        self._memories: Dict[str, asyncio.Future] = {}
+        self._failed_loads = set()
+
+    @staticmethod
+    async def ensure_indexes():
+        # Um documento por usuário: sem o índice único, upserts simultâneos de workers diferentes
+        # na primeira interação criariam documentos duplicados
+        await mongodb_crud.create_index(MEMORY_COLLECTION, [("user_id", 1)], unique=True)
+        # Cobre a busca por usuário e a validação do cache (versao e last_interaction) sem ler o documento
+        await mongodb_crud.create_index(MEMORY_COLLECTION, [("user_id", 1), ("versao", 1), ("last_interaction", 1)])
 
     async def get_user_memory(self, user_id: str) -> Optional[Dict[str, Any]]:
         """Recupera a memória do usuário"""
+        if user_id not in self._memories:
+            self._memories[user_id] = asyncio.ensure_future(self._load_memory(user_id))
+        # shield: o timeout de uma etapa não cancela a leitura compartilhada com as outras
+        return await asyncio.shield(self._memories[user_id])
+
+    async def _load_memory(self, user_id: str) -> Optional[Dict[str, Any]]:
         try:
-            memory = await mongodb_crud.find_document("user_memory", {"user_id": user_id})
+            memory = await memory_cache.get(user_id)
+            if memory is None:
+                memory = await mongodb_crud.find_document(MEMORY_COLLECTION, {"user_id": user_id})
+                if memory:
+                    memory_cache.set(user_id, memory)
             return memory
         except Exception as e:
             print(f"Erro ao buscar memória: {e}")
+            self._failed_loads.add(user_id)
             return None
 
-    async def update_user_memory(self, user_id: str, interaction: Dict[str, Any]):
-        """Atualiza a memória do usuário com nova interação"""
-        try:
-            existing_memory = await self.get_user_memory(user_id)
-            
-            new_interaction = {
-                "timestamp": datetime.now(),
-                "request": interaction.get("request"),
-                "response": interaction.get("response"),
-                "profile": interaction.get("profile"),
-                "objective": interaction.get("objective")
-            }
-
-            if existing_memory:
-                # Atualiza memória existente
-                history = existing_memory.get("conversation_history", [])
-                history.append(new_interaction)
-                
-                # Mantém apenas o histórico mais recente
-                if len(history) > self.max_history:
-                    history = history[-self.max_history:]
-                
-                await mongodb_crud.update_document(
-                    "user_memory", 
-                    {"user_id": user_id},
-                    {
-                        "conversation_history": history,
-                        "last_interaction": datetime.now(),
-                        "preferences": self._extract_preferences(history),
-                        "dominant_profile": new_interaction.get("profile")
-                    }
-                )
-            else:
-                # Cria nova memória
-                memory_data = {
-                    "user_id": user_id,
-                    "conversation_history": [new_interaction],
-                    "last_interaction": datetime.now(),
-                    "preferences": {},
-                    "dominant_profile": new_interaction.get("profile"),
-                    "created_at": datetime.now()
-                }
-                await mongodb_crud.create_document("user_memory", memory_data)
-        except Exception as e:
-            print(f"Erro ao atualizar memória: {e}")
+    def _write_through(self, user_id: str, update: Dict[str, Any]):
+        loaded = self._memories.pop(user_id, None)
+        if loaded is None or not loaded.done() or user_id in self._failed_loads:
+            # Sem o documento de partida não dá para aplicar a atualização localmente
+            memory_cache.invalidate(user_id)
+            return
+        memory_cache.apply(user_id, loaded.result(), update)
+
+    def memory_update(self, user_id: str, interaction: Dict[str, Any]) -> UpdateOne:
+        """Atualização da memória com a nova interação, como operação para `bulk_write` (write-behind)"""
+        update = self._memory_update(interaction)
+        self._write_through(user_id, update)
+        return UpdateOne({"user_id": user_id}, update, upsert=True)
+
+    def _memory_update(self, interaction: Dict[str, Any]) -> Dict[str, Any]:
+        """Atualização atômica que registra a interação, sem ler o documento.
+
+        O histórico recebe a interação com `$push` e é limitado às últimas `max_history`
+        com `$slice`; as preferências são contadores de perfil, um campo por perfil, com `$inc`.
+        Objetivos não viram contadores: cada redação criaria um campo novo no documento.
+        """
+        now = datetime.now()
+        # Precisão do BSON (ms): o carimbo no cache precisa ser igual ao gravado no banco
+        now = now.replace(microsecond=now.microsecond // 1000 * 1000)
+        profile = interaction.get("profile")
+        increments = {"versao": 1, "preferences.interaction_count": 1}
+        if profile:
+            increments[f"preferences.profile_counts.{profile}"] = 1
+
+        return {
+            "$push": {"conversation_history": {
+                # Entrada compacta: o pedido e o texto gerado ficam no documento de `historico`
+                "$each": [memory_interaction(profile, interaction.get("objective"), interaction.get("historico_id"), now)],
+                "$slice": -self.max_history
+            }},
+            "$set": {"last_interaction": now, "dominant_profile": profile},
+            "$inc": increments,
+            "$setOnInsert": {"created_at": now}
+        }
 
     async def get_conversation_context(self, user_id: str) -> str:
         """Gera contexto para IA baseado no histórico"""
@@ -69,36 +176,13 @@ class MemoryManager:
             if not memory or not memory.get("conversation_history"):
                 return ""
 
-            history = memory["conversation_history"][-3:]  # Últimas 3 interações
-            context = "Histórico recente da conversa:\n"
-            
-            if memory.get("dominant_profile"):
-                dominant_profile = memory.get('dominant_profile')
-                context += f"Perfil dominante do usuário: {dominant_profile}\n\n"
-
-            for i, interaction in enumerate(history):
-                context += f"Interação {i+1}:\n"
-                context += f"Objetivo: {interaction.get('objective', 'N/A')}\n"
-                context += f"Perfil: {interaction.get('profile', 'N/A')}\n\n"
-            
-            return context
+            # Interações recentes completas, anteriores resumidas, tudo dentro do orçamento de tokens
+            return compact_history(
+                memory["conversation_history"],
+                memory.get("dominant_profile"),
+                settings.context_recent_interactions,
+                settings.context_token_budget
+            )
         except Exception as e:
             print(f"Erro ao gerar contexto: {e}")
             return ""
-
-    def _extract_preferences(self, history: List[Dict]) -> Dict[str, Any]:
-        """Extrai preferências do usuário do histórico"""
-        try:
-            if not history:
-                return {}
-
-            profiles = [interaction.get('profile') for interaction in history if interaction.get('profile')]
-            objectives = [interaction.get('objective') for interaction in history if interaction.get('objective')]
-            
-            return {
-                "preferred_profile": max(set(profiles), key=profiles.count) if profiles else None,
-                "common_objectives": list(set(objectives))[:3],
-                "interaction_count": len(history)
-            }
-        except:
-            return {}
\ No newline at end of file
@@ -6,10 +6,10 @@ async def create_document(collection_name: str, document: dict):
     result = await collection.insert_one(document)
     return str(result.inserted_id)
 
-async def find_document(collection_name: str, query: dict):
+async def find_document(collection_name: str, query: dict, projection: dict = None):
     """Busca um documento em uma coleção."""
     collection = mongodb.database[collection_name]
-    document = await collection.find_one(query)
+    document = await collection.find_one(query, projection)
     return document
 
 async def update_document(collection_name: str, query: dict, new_values: dict):
@@ -18,17 +18,70 @@ async def update_document(collection_name: str, query: dict, new_values: dict):
     result = await collection.update_one(query, {"$set": new_values})
     return result.modified_count
 
+async def apply_update(collection_name: str, query: dict, update: dict, upsert: bool = False):
+    """Aplica operadores de atualização ($inc, $push, ...) a um documento."""
+    collection = mongodb.database[collection_name]
+    result = await collection.update_one(query, update, upsert=upsert)
+    return result.modified_count
+
+async def find_one_and_update(collection_name: str, query: dict, update: dict, projection: dict = None):
+    """Aplica operadores de atualização a um documento e retorna o documento anterior à escrita."""
+    collection = mongodb.database[collection_name]
+    return await collection.find_one_and_update(query, update, projection)
+
+async def update_documents(collection_name: str, query: dict, new_values: dict):
+    """Atualiza todos os documentos que correspondem a uma query."""
+    collection = mongodb.database[collection_name]
+    result = await collection.update_many(query, {"$set": new_values})
+    return result.modified_count
+
 async def delete_document(collection_name: str, query: dict):
     """Deleta um documento de uma coleção."""
     collection = mongodb.database[collection_name]
     result = await collection.delete_one(query)
     return result.deleted_count
 
-async def find_all_documents(collection_name: str, query: dict = None):
+async def delete_documents(collection_name: str, query: dict):
+    """Deleta todos os documentos que correspondem a uma query."""
+    collection = mongodb.database[collection_name]
+    result = await collection.delete_many(query)
+    return result.deleted_count
+
+async def create_documents(collection_name: str, documents: list):
+    """Insere vários documentos em uma única operação."""
+    collection = mongodb.database[collection_name]
+    result = await collection.insert_many(documents)
+    return [str(inserted_id) for inserted_id in result.inserted_ids]
+
+async def find_all_documents(collection_name: str, query: dict = None, projection: dict = None):
     """Busca todos os documentos em uma coleção que correspondem a uma query."""
     collection = mongodb.database[collection_name]
     documents = []
-    async for document in collection.find(query or {}):
+    async for document in collection.find(query or {}, projection):
         documents.append(document)
     return documents
 
+async def iterate_documents(collection_name: str, query: dict = None, projection: dict = None, batch_size: int = 500):
+    """Percorre os documentos de uma coleção pelo cursor, sem carregá-los todos na memória."""
+    collection = mongodb.database[collection_name]
+    async for document in collection.find(query or {}, projection, batch_size=batch_size):
+        yield document
+
+async def create_index(collection_name: str, keys: list, **kwargs):
+    """Cria um índice em uma coleção (operação idempotente)."""
+    collection = mongodb.database[collection_name]
+    return await collection.create_index(keys, **kwargs)
+
+async def aggregate(collection_name: str, pipeline: list):
+    """Executa um pipeline de agregação e retorna todos os resultados."""
+    collection = mongodb.database[collection_name]
+    results = []
+    async for document in collection.aggregate(pipeline):
+        results.append(document)
+    return results
+
+async def bulk_write(collection_name: str, operations: list, ordered: bool = False):
+    """Executa várias operações de escrita em uma única ida ao banco."""
+    collection = mongodb.database[collection_name]
+    return await collection.bulk_write(operations, ordered=ordered)
+
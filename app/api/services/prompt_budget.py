@@ -0,0 +1,98 @@
+from typing import List, Dict, Any, Optional
+from collections import Counter
+from app.core.utils.text_processing import extrair_palavras_chave
+
+# Estimativa sem tokenizador: ~4 caracteres por token, próxima do que Gemini e OpenAI cobram para português
+CHARS_PER_TOKEN = 4
+TRUNCATION_MARK = " [...]"
+
+def estimate_tokens(text: str) -> int:
+    return -(-len(text or "") // CHARS_PER_TOKEN)
+
+def truncate_to_tokens(text: str, max_tokens: int) -> str:
+    """Corta o texto para caber em `max_tokens`, terminando em um espaço em branco"""
+    if estimate_tokens(text) <= max_tokens:
+        return text
+    limit = max(0, max_tokens * CHARS_PER_TOKEN - len(TRUNCATION_MARK))
+    cut = text[:limit]
+    if " " in cut or "\n" in cut:
+        cut = cut[:max(cut.rfind(" "), cut.rfind("\n"))]
+    return cut.rstrip() + TRUNCATION_MARK if cut.strip() else ""
+
+def _format_interaction(number: int, interaction: Dict[str, Any]) -> str:
+    return (
+        f"Interação {number}:\n"
+        f"Objetivo: {interaction.get('objective', 'N/A')}\n"
+        f"Perfil: {interaction.get('profile', 'N/A')}\n\n"
+    )
+
+def summarize_interactions(history: List[Dict[str, Any]], max_topics: int = 5) -> str:
+    """Resumo curto de interações antigas: contagem de perfis e temas mais frequentes dos objetivos"""
+    if not history:
+        return ""
+    profiles = Counter(interaction.get("profile") for interaction in history if interaction.get("profile"))
+    topics = Counter(
+        palavra
+        for interaction in history
+        for palavra in extrair_palavras_chave(interaction.get("objective") or "")
+    )
+    summary = f"Resumo de {len(history)} interações anteriores"
+    if profiles:
+        summary += ": perfis " + ", ".join(f"{profile} ({count})" for profile, count in profiles.most_common())
+    if topics:
+        summary += "; temas frequentes: " + ", ".join(topic for topic, _ in topics.most_common(max_topics))
+    return summary + "\n\n"
+
+def compact_history(history: List[Dict[str, Any]], dominant_profile: Optional[str], recent: int, max_tokens: int) -> str:
+    """Contexto de conversa dentro do orçamento de tokens.
+
+    As `recent` últimas interações entram completas e as anteriores viram um resumo. Se ainda
+    passar do orçamento, mais interações vão para o resumo e, por fim, o texto é truncado.
+    """
+    header = "Histórico recente da conversa:\n"
+    if dominant_profile:
+        header += f"Perfil dominante do usuário: {dominant_profile}\n\n"
+
+    recent = min(recent, len(history))
+    while True:
+        older, latest = history[:len(history) - recent], history[len(history) - recent:]
+        context = header + summarize_interactions(older) + "".join(
+            _format_interaction(i + 1, interaction) for i, interaction in enumerate(latest)
+        )
+        if recent == 0 or estimate_tokens(context) <= max_tokens:
+            break
+        recent -= 1
+    return truncate_to_tokens(context, max_tokens)
+
+class TokenUsageTracker:
+    """Totais de tokens de prompt e de resposta do processo, para planejamento de capacidade"""
+
+    def __init__(self):
+        self.requests = 0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.max_prompt_tokens = 0
+        self.truncated_prompts = 0
+
+    def record(self, prompt_tokens: int, completion_tokens: int):
+        self.requests += 1
+        self.prompt_tokens += prompt_tokens
+        self.completion_tokens += completion_tokens
+        self.max_prompt_tokens = max(self.max_prompt_tokens, prompt_tokens)
+
+    def record_truncation(self):
+        self.truncated_prompts += 1
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "requisicoes": self.requests,
+            "tokens_prompt": self.prompt_tokens,
+            "tokens_resposta": self.completion_tokens,
+            "media_prompt": round(self.prompt_tokens / self.requests, 1) if self.requests else 0.0,
+            "media_resposta": round(self.completion_tokens / self.requests, 1) if self.requests else 0.0,
+            "maior_prompt": self.max_prompt_tokens,
+            "prompts_truncados": self.truncated_prompts
+        }
+
+# Contadores compartilhados pelo processo
+token_usage = TokenUsageTracker()
@@ -1,40 +1,180 @@
 import httpx
+import asyncio
+import time
 from typing import Optional, Dict, Any
-from datetime import datetime
+from datetime import datetime, date
+from app.core.config.settings import settings
+from app.api.services.selic_store import selic_store
+from app.core.utils.circuit_breaker import CircuitBreaker
 import json
 
+# A série 11 do SGS traz a taxa Selic diária (% a.d.); o restante da aplicação usa % a.a.
+BUSINESS_DAYS_PER_YEAR = 252
+
+def annualize_daily_rate(daily_rate: Optional[float]) -> Optional[float]:
+    """Converte a taxa diária da série (% a.d.) para a taxa anual equivalente (% a.a., base 252)"""
+    if daily_rate is None:
+        return None
+    return round(((1 + daily_rate / 100) ** BUSINESS_DAYS_PER_YEAR - 1) * 100, 2)
+
+# Cliente HTTP compartilhado pelo processo (mantém conexões abertas entre chamadas)
+_http_client: Optional[httpx.AsyncClient] = None
+
+def get_http_client() -> httpx.AsyncClient:
+    global _http_client
+    if _http_client is None or _http_client.is_closed:
+        _http_client = httpx.AsyncClient(
+            timeout=settings.selic_timeout_seconds,
+            limits=httpx.Limits(max_connections=10, max_keepalive_connections=5)
+        )
+    return _http_client
+
+async def close_http_client():
+    global _http_client
+    if _http_client is not None:
+        await _http_client.aclose()
+        _http_client = None
+
+class _SelicCache:
+    """Último valor obtido e a busca em andamento, compartilhados por todas as instâncias"""
+    value: Optional[float] = None
+    fetched_at: float = 0.0
+    inflight: Optional[asyncio.Task] = None
+    upstream_calls: int = 0
+
+    def age(self) -> Optional[float]:
+        return time.monotonic() - self.fetched_at if self.value is not None else None
+
+_cache = _SelicCache()
+_breaker = CircuitBreaker(settings.selic_breaker_failure_threshold, settings.selic_breaker_reset_seconds)
+
+def selic_status() -> Dict[str, Any]:
+    """Estado da taxa Selic em cache, exposto em /health"""
+    age = _cache.age()
+    if _cache.value is not None:
+        value, source = _cache.value, "cache"
+    elif selic_store.latest_value() is not None:
+        value, source = annualize_daily_rate(selic_store.latest_value()), "serie_local"
+    else:
+        value, source = settings.selic_fallback_rate, "padrao"
+    return {
+        "valor": value,
+        "fonte": source,
+        "idade_segundos": round(age, 1) if age is not None else None,
+        "desatualizado": age is None or age > settings.selic_cache_ttl_seconds + settings.selic_stale_ttl_seconds,
+        "circuito": _breaker.stats(),
+        "chamadas_upstream": _cache.upstream_calls
+    }
+
+async def run_selic_refresher():
+    """Mantém a taxa Selic aquecida em segundo plano (iniciada no lifespan)"""
+    api = SelicAPI()
+    while True:
+        try:
+            await api.refresh()
+        except Exception as e:
+            print(f"Erro no atualizador da Selic: {e}")
+        await asyncio.sleep(max(settings.selic_refresh_interval_seconds, _breaker.seconds_until_retry()))
+
 class SelicAPI:
     def __init__(self):
-        self.base_url = "https://api.bcb.gov.br/dados/serie/bcdata.sgs.11/dados"
-        
+        self.base_url = settings.selic_api_url
+
     async def get_current_selic(self) -> Optional[float]:
-        """Obtém a taxa Selic atual"""
-        try:
-            async with httpx.AsyncClient() as client:
-                response = await client.get(f"{self.base_url}/ultimos/1", timeout=10.0)
-                response.raise_for_status()
-                
-                data = response.json()
-                if data and isinstance(data, list) and len(data) > 0:
-                    return float(data[0]['valor'])
+        """Obtém a taxa Selic atual (% a.a.) sem aguardar a rede: cache em memória ou série local"""
+        age = _cache.age()
+        if age is None or age >= settings.selic_cache_ttl_seconds:
+            # Ausente ou expirado: responde já e atualiza em segundo plano
+            self._start_refresh()
+        if _cache.value is not None:
+            return _cache.value
+        return annualize_daily_rate(selic_store.latest_value())
+
+    async def refresh(self) -> Optional[float]:
+        """Busca a taxa no BCB; chamadas concorrentes compartilham uma única requisição"""
+        task = self._start_refresh()
+        if task is None:
+            return _cache.value
+        value = await asyncio.shield(task)
+        return value if value is not None else _cache.value
+
+    def _start_refresh(self) -> Optional[asyncio.Task]:
+        if _cache.inflight is None or _cache.inflight.done():
+            # Com o disjuntor aberto o BCB não é chamado
+            if not _breaker.allow_request():
                 return None
-                
+            _cache.inflight = asyncio.create_task(self._fetch_current())
+        return _cache.inflight
+
+    async def _fetch_current(self) -> Optional[float]:
+        _cache.upstream_calls += 1
+        synced = None
+        try:
+            # Sincroniza a série local de forma incremental e usa o último ponto
+            synced = await selic_store.sync(self)
+        except Exception as e:
+            print(f"Erro ao sincronizar série Selic: {e}")
+
+        value = annualize_daily_rate(selic_store.latest_value())
+        if value is None:
+            value = await self._fetch_latest()
+        elif synced is None:
+            value = None
+
+        if value is None:
+            _breaker.record_failure()
+            return None
+        _breaker.record_success()
+        _cache.value = value
+        _cache.fetched_at = time.monotonic()
+        return value
+
+    async def _fetch_latest(self) -> Optional[float]:
+        try:
+            response = await get_http_client().get(f"{self.base_url}/ultimos/1")
+            response.raise_for_status()
+
+            data = response.json()
+            if data and isinstance(data, list) and len(data) > 0:
+                return annualize_daily_rate(float(data[0]['valor']))
+            return None
+
         except Exception as e:
             print(f"Erro ao obter taxa Selic: {e}")
             return None
-    
+
+    async def get_series(self, start: date, end: date) -> Optional[list]:
+        """Obtém os pontos da série entre duas datas diretamente do BCB"""
+        try:
+            response = await get_http_client().get(self.base_url, params={
+                "formato": "json",
+                "dataInicial": start.strftime("%d/%m/%Y"),
+                "dataFinal": end.strftime("%d/%m/%Y")
+            })
+            if response.status_code == 404:
+                return []  # Nenhum ponto novo no intervalo
+            response.raise_for_status()
+
+            data = response.json()
+            return data if isinstance(data, list) else None
+
+        except Exception as e:
+            print(f"Erro ao obter série Selic: {e}")
+            return None
+
     async def get_selic_history(self, days: int = 30) -> Optional[list]:
-        """Obtém histórico da Selic"""
+        """Obtém histórico da Selic (da série local quando disponível)"""
+        if len(selic_store):
+            return selic_store.history(days)
         try:
-            async with httpx.AsyncClient() as client:
-                response = await client.get(f"{self.base_url}/ultimos/{days}", timeout=10.0)
-                response.raise_for_status()
-                
-                data = response.json()
-                if data and isinstance(data, list):
-                    return data
-                return None
-                
+            response = await get_http_client().get(f"{self.base_url}/ultimos/{days}")
+            response.raise_for_status()
+
+            data = response.json()
+            if data and isinstance(data, list):
+                return data
+            return None
+
         except Exception as e:
             print(f"Erro ao obter histórico Selic: {e}")
             return None
@@ -42,10 +182,12 @@ class SelicAPI:
 # Fallback para quando a API não estiver disponível
 class MockSelicAPI:
     def __init__(self):
-        self.mock_selic = 0.1175  # 11.75% ao ano
-        
+        self.mock_selic = settings.selic_fallback_rate  # % ao ano, como a API real
+
     async def get_current_selic(self) -> float:
         return self.mock_selic
-    
+
     async def get_selic_history(self, days: int = 30) -> list:
-        return [{"data": "2024-01-01", "valor": self.mock_selic}]
\ No newline at end of file
+        if len(selic_store):
+            return selic_store.history(days)
+        return [{"data": "2024-01-01", "valor": self.mock_selic}]
@@ -0,0 +1,107 @@
+from typing import Optional, List, Dict, Any
+from datetime import datetime, date, timedelta, timezone
+from pymongo import UpdateOne
+from app.api.services import mongodb_crud
+from app.core.config.settings import settings
+import bisect
+import time
+
+SELIC_COLLECTION = "selic_series"
+
+class SelicSeriesStore:
+    """Série histórica da Selic persistida no MongoDB e espelhada em memória.
+
+    As consultas (último valor, histórico e intervalos) são respondidas localmente por
+    busca binária; a rede só é usada por `sync`, que baixa apenas os dias após o último
+    armazenado. Sem conexão com o BCB, a série local continua disponível (modo offline).
+    """
+
+    def __init__(self):
+        self._ordinals: List[int] = []
+        self._values: List[float] = []
+        self.synced_at: Optional[float] = None
+
+    def __len__(self) -> int:
+        return len(self._values)
+
+    async def ensure_indexes(self):
+        await mongodb_crud.create_index(SELIC_COLLECTION, [("data", 1)], unique=True)
+
+    async def load(self):
+        """Carrega a série armazenada no MongoDB para a memória"""
+        documents = await mongodb_crud.find_all_documents(SELIC_COLLECTION, None, {"_id": 0, "data": 1, "valor": 1})
+        points = sorted((doc["data"].date().toordinal(), float(doc["valor"])) for doc in documents)
+        self._ordinals = [ordinal for ordinal, _ in points]
+        self._values = [value for _, value in points]
+
+    async def sync(self, selic_api) -> Optional[int]:
+        """Baixa e persiste os pontos posteriores ao último dia armazenado.
+
+        Retorna quantos pontos foram adicionados, ou None se o BCB não respondeu.
+        """
+        today = date.today()
+        if self._ordinals:
+            start = date.fromordinal(self._ordinals[-1]) + timedelta(days=1)
+        else:
+            start = today - timedelta(days=settings.selic_sync_initial_days)
+        if start > today:
+            self.synced_at = time.monotonic()
+            return 0
+
+        data = await selic_api.get_series(start, today)
+        if data is None:
+            return None
+
+        points = []
+        for item in data:
+            day = datetime.strptime(item["data"], "%d/%m/%Y").date()
+            if day >= start:
+                points.append((day, float(item["valor"])))
+
+        if points:
+            await mongodb_crud.bulk_write(SELIC_COLLECTION, [
+                UpdateOne(
+                    {"data": datetime(day.year, day.month, day.day, tzinfo=timezone.utc)},
+                    {"$set": {"valor": value}},
+                    upsert=True
+                )
+                for day, value in points
+            ])
+            for day, value in points:
+                self._insert(day.toordinal(), value)
+        self.synced_at = time.monotonic()
+        return len(points)
+
+    def _insert(self, ordinal: int, value: float):
+        position = bisect.bisect_left(self._ordinals, ordinal)
+        if position < len(self._ordinals) and self._ordinals[position] == ordinal:
+            self._values[position] = value
+        else:
+            self._ordinals.insert(position, ordinal)
+            self._values.insert(position, value)
+
+    def latest(self) -> Optional[Dict[str, Any]]:
+        """Último ponto da série"""
+        if not self._values:
+            return None
+        return self._point(len(self._values) - 1)
+
+    def latest_value(self) -> Optional[float]:
+        return self._values[-1] if self._values else None
+
+    def history(self, points: int = 30) -> List[Dict[str, Any]]:
+        """Últimos `points` pontos da série, no formato da API do BCB"""
+        start = max(0, len(self._values) - points)
+        return [self._point(i) for i in range(start, len(self._values))]
+
+    def range(self, start: date, end: date) -> List[Dict[str, Any]]:
+        """Pontos entre `start` e `end` (inclusive)"""
+        first = bisect.bisect_left(self._ordinals, start.toordinal())
+        last = bisect.bisect_right(self._ordinals, end.toordinal())
+        return [self._point(i) for i in range(first, last)]
+
+    def _point(self, index: int) -> Dict[str, Any]:
+        return {"data": date.fromordinal(self._ordinals[index]).strftime("%d/%m/%Y"), "valor": self._values[index]}
+
+# Série compartilhada pelo processo
+selic_store = SelicSeriesStore()
@@ -0,0 +1,144 @@
+from typing import Any, Dict, List, Optional, Callable
+from collections import defaultdict
+import asyncio
+import time
+from app.api.services import mongodb_crud
+from app.core.config.settings import settings
+
+class WriteBehindQueue:
+    """Persistência fora do caminho crítico: fila limitada drenada em lotes por um worker.
+
+    Inserções são agrupadas por coleção em um `insert_many`, operações do pymongo (UpdateOne,
+    ...) em um `bulk_write` ordenado e chamadas assíncronas rodam em sequência no worker.
+    Com a fila cheia, `put` espera (backpressure). Sem worker ativo, grava na hora.
+    """
+
+    def __init__(self, max_size: int, batch_size: int, flush_interval: float):
+        self.max_size = max_size
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._queue: Optional[asyncio.Queue] = None
+        self._worker: Optional[asyncio.Task] = None
+        self.enqueued = 0
+        self.written = 0
+        self.failed = 0
+        self.batches = 0
+        self.largest_batch = 0
+        self.blocked = 0
+        self.total_blocked_time = 0.0
+        self.total_flush_time = 0.0
+        self.max_flush_time = 0.0
+
+    @property
+    def running(self) -> bool:
+        return self._worker is not None and not self._worker.done()
+
+    def start(self):
+        if not self.running:
+            self._queue = asyncio.Queue(self.max_size)
+            self._worker = asyncio.create_task(self._run())
+
+    async def insert(self, collection: str, document: dict):
+        await self.put(("insert", collection, document))
+
+    async def write(self, collection: str, operation):
+        await self.put(("write", collection, operation))
+
+    async def call(self, func: Callable, *args):
+        await self.put(("call", func, args))
+
+    async def put(self, item: tuple):
+        if not self.running:
+            await self._flush([item])
+            return
+        self.enqueued += 1
+        if self._queue.full():
+            self.blocked += 1
+            started = time.perf_counter()
+            await self._queue.put(item)
+            self.total_blocked_time += time.perf_counter() - started
+        else:
+            self._queue.put_nowait(item)
+
+    async def _run(self):
+        while True:
+            batch = [await self._queue.get()]
+            # Espera um pouco para juntar mais itens, a menos que já haja um lote completo
+            if self._queue.qsize() < self.batch_size - 1:
+                await asyncio.sleep(self.flush_interval)
+            while len(batch) < self.batch_size and not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+            try:
+                await self._flush(batch)
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+    async def _flush(self, batch: List[tuple]):
+        started = time.perf_counter()
+        inserts: Dict[str, list] = defaultdict(list)
+        writes: Dict[str, list] = defaultdict(list)
+        calls = []
+        for kind, target, payload in batch:
+            if kind == "insert":
+                inserts[target].append(payload)
+            elif kind == "write":
+                writes[target].append(payload)
+            else:
+                calls.append((target, payload))
+
+        for collection, documents in inserts.items():
+            await self._apply(len(documents), mongodb_crud.create_documents, collection, documents)
+        for collection, operations in writes.items():
+            await self._apply(len(operations), mongodb_crud.bulk_write, collection, operations, True)
+        for func, args in calls:
+            await self._apply(1, func, *args)
+
+        elapsed = time.perf_counter() - started
+        self.batches += 1
+        self.largest_batch = max(self.largest_batch, len(batch))
+        self.total_flush_time += elapsed
+        self.max_flush_time = max(self.max_flush_time, elapsed)
+
+    async def _apply(self, count: int, func: Callable, *args):
+        # Falhas são contadas e registradas; o worker segue drenando a fila
+        try:
+            await func(*args)
+            self.written += count
+        except Exception as e:
+            self.failed += count
+            print(f"Erro na gravação em segundo plano ({count} itens): {e}")
+
+    async def close(self, timeout: Optional[float] = None):
+        """Grava o que está na fila e encerra o worker"""
+        if not self.running:
+            return
+        try:
+            await asyncio.wait_for(self._queue.join(), timeout)
+        except asyncio.TimeoutError:
+            print(f"Aviso: {self._queue.qsize()} gravações pendentes descartadas no encerramento")
+        self._worker.cancel()
+        self._worker = None
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "ativo": self.running,
+            "profundidade": self._queue.qsize() if self._queue else 0,
+            "capacidade": self.max_size,
+            "enfileiradas": self.enqueued,
+            "gravadas": self.written,
+            "falhas": self.failed,
+            "lotes": self.batches,
+            "maior_lote": self.largest_batch,
+            "bloqueios_fila_cheia": self.blocked,
+            "espera_fila_cheia_ms": round(1000 * self.total_blocked_time, 2),
+            "flush_medio_ms": round(1000 * self.total_flush_time / self.batches, 2) if self.batches else 0.0,
+            "flush_maximo_ms": round(1000 * self.max_flush_time, 2)
+        }
+
+# Fila compartilhada pelo processo; o worker é iniciado no lifespan da aplicação
+write_behind = WriteBehindQueue(
+    settings.write_behind_queue_size,
+    settings.write_behind_batch_size,
+    settings.write_behind_flush_interval_seconds
+)
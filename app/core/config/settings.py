@@ -4,16 +4,85 @@ from typing import Optional
 class Settings(BaseSettings):
     app_name: str = "API Educação Financeira Inteligente"
     mongodb_url: str
-    gemini_api_key: str
-    selic_api_url: str = "https://api.bcb.gov.br/dados/serie/bcdata.sgs.11/dados"
+    gemini_api_key: str = ""
+    gemini_model: str = "models/gemini-2.5-flash"
+    gemini_timeout_seconds: float = 60.0
+
+    # Backend de IA: "gemini", "openai" (API compatível com OpenAI) ou "stub" (local, determinístico)
+    llm_backend: str = "gemini"
+    llm_fallback_backend: str = ""             # Se definido, recebe hedge/fallback do principal
+    llm_hedge_min_samples: int = 20            # Amostras antes de usar o p95 observado como prazo do hedge
+    llm_hedge_default_delay_seconds: float = 15.0
+    openai_api_key: str = ""
+    openai_base_url: Optional[str] = None
+    openai_model: str = "gpt-4o-mini"
+    openai_timeout_seconds: float = 60.0
+    stub_latency_seconds: float = 0.5
+    stub_tokens_per_second: float = 50.0
+    stub_timeout_seconds: float = 30.0
+    selic_api_url: str = "https://api.bcb.gov.br/dados/serie/bcdata.sgs.11/dados"  # Selic diária (% a.d.), anualizada na leitura
+    selic_timeout_seconds: float = 10.0
+    selic_cache_ttl_seconds: int = 3600       # Valor considerado atual
+    selic_stale_ttl_seconds: int = 86400      # Após o TTL, valor servido enquanto é atualizado em segundo plano
+    selic_sync_initial_days: int = 365        # Janela baixada na primeira sincronização da série local
+    selic_refresh_interval_seconds: int = 900
+    selic_breaker_failure_threshold: int = 3
+    selic_breaker_reset_seconds: int = 300
+    selic_fallback_rate: float = 11.75        # % ao ano, usada enquanto não há valor obtido
     
     # Novas configurações
     enable_memory: bool = True
     enable_analytics: bool = True
     enable_investment_calc: bool = True
     max_conversation_history: int = 10
+
+    # Cache de memória dos usuários por worker; com validação, cada acerto confere versao/last_interaction
+    memory_cache_size: int = 10000
+    memory_cache_ttl_seconds: int = 300
+    memory_cache_validate: bool = True
+
+    # Orçamento de tokens (estimados) do prompt e do contexto de conversa
+    prompt_token_budget: int = 2000
+    context_token_budget: int = 600
+    context_recent_interactions: int = 3   # Interações enviadas completas; as anteriores vão resumidas
+    llm_max_concurrency: int = 8  # Chamadas simultâneas ao modelo de IA por processo
+
+    # Cache de conteúdo gerado: "memory" (por worker), "mongo" (compartilhado) ou "none"
+    content_cache_backend: str = "memory"
+    content_cache_size: int = 512
+    content_cache_ttl_seconds: int = 86400
+    content_cache_bypass_with_context: bool = True  # Com histórico de conversa, não usa o cache
+
     investment_simulation_years: int = 5
 
+    # Gravação em segundo plano de memória e histórico
+    write_behind_queue_size: int = 10000
+    write_behind_batch_size: int = 200
+    write_behind_flush_interval_seconds: float = 0.05
+    write_behind_shutdown_timeout_seconds: float = 10.0
+
+    # Tempo máximo de cada etapa do /gerar-conteudo antes de seguir com o resultado degradado
+    stage_timeout_classification_seconds: float = 3.0
+    stage_timeout_simulation_seconds: float = 3.0
+    stage_timeout_peer_analysis_seconds: float = 3.0
+    stage_timeout_context_seconds: float = 2.0
+
+    # Análise comparativa: "peers" (consulta por faixa em usuarios), "cohort" (estatísticas materializadas)
+    # ou "columnar" (snapshot NumPy em memória)
+    analytics_source: str = "peers"
+    analytics_snapshot_refresh_seconds: int = 300
+
+    simulation_cache_size: int = 1024
+
+    # Simulação de Monte Carlo
+    monte_carlo_paths: int = 10000
+    monte_carlo_max_paths: int = 200000        # Memória por requisição ~ caminhos x anos x 8 bytes (80 MB no limite)
+    monte_carlo_chunk_size: int = 10000
+    monte_carlo_process_threshold: int = 50000  # A partir daqui os blocos vão para o pool de processos
+    monte_carlo_workers: int = 2
+    monte_carlo_max_concurrency: int = 2        # Simulações simultâneas por processo; limita CPU e memória
+    monte_carlo_timeout_seconds: float = 5.0
+
     model_config = SettingsConfigDict(env_file=".env")
 
 settings = Settings()
\ No newline at end of file
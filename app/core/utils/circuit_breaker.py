@@ -0,0 +1,52 @@
+import time
+from typing import Dict, Any, Optional
+
+class CircuitBreaker:
+    """Disjuntor simples: abre após falhas consecutivas e testa novamente após um intervalo.
+
+    fechado -> chamadas liberadas; aberto -> chamadas bloqueadas até `reset_timeout`;
+    meio-aberto -> uma chamada de teste decide se volta a fechar ou reabre.
+    """
+
+    def __init__(self, failure_threshold: int = 3, reset_timeout: float = 60.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self._probing = False
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "fechado"
+        if time.monotonic() - self.opened_at >= self.reset_timeout:
+            return "meio-aberto"
+        return "aberto"
+
+    def allow_request(self) -> bool:
+        state = self.state
+        if state == "fechado":
+            return True
+        if state == "meio-aberto" and not self._probing:
+            self._probing = True
+            return True
+        return False
+
+    def record_success(self):
+        self.failures = 0
+        self.opened_at = None
+        self._probing = False
+
+    def record_failure(self):
+        self.failures += 1
+        self._probing = False
+        if self.opened_at is not None or self.failures >= self.failure_threshold:
+            self.opened_at = time.monotonic()
+
+    def seconds_until_retry(self) -> float:
+        if self.opened_at is None:
+            return 0.0
+        return max(0.0, self.reset_timeout - (time.monotonic() - self.opened_at))
+
+    def stats(self) -> Dict[str, Any]:
+        return {"estado": self.state, "falhas_consecutivas": self.failures}
@@ -0,0 +1,43 @@
+import asyncio
+import time
+from typing import Dict, Any
+
+class ConcurrencyLimiter:
+    """Semáforo com métricas de fila (profundidade e tempo de espera)"""
+
+    def __init__(self, limit: int):
+        self.limit = limit
+        self._semaphore = asyncio.Semaphore(limit)
+        self.waiting = 0
+        self.in_flight = 0
+        self.completed = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+
+    async def __aenter__(self):
+        self.waiting += 1
+        started = time.perf_counter()
+        try:
+            await self._semaphore.acquire()
+        finally:
+            self.waiting -= 1
+        waited = time.perf_counter() - started
+        self.total_wait += waited
+        self.max_wait = max(self.max_wait, waited)
+        self.in_flight += 1
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        self.in_flight -= 1
+        self.completed += 1
+        self._semaphore.release()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "limite": self.limit,
+            "em_execucao": self.in_flight,
+            "fila": self.waiting,
+            "concluidas": self.completed,
+            "espera_media_ms": round(1000 * self.total_wait / self.completed, 2) if self.completed else 0.0,
+            "espera_maxima_ms": round(1000 * self.max_wait, 2)
+        }
@@ -0,0 +1,166 @@
+import math
+import random
+from typing import Dict, List, Optional, Any
+
+class RunningMoments:
+    """Média e variância incrementais (Welford), combináveis entre coortes (Chan et al.)"""
+
+    def __init__(self, n: int = 0, mean: float = 0.0, m2: float = 0.0):
+        self.n = n
+        self.mean = mean
+        self.m2 = m2
+
+    def add(self, value: float):
+        self.n += 1
+        delta = value - self.mean
+        self.mean += delta / self.n
+        self.m2 += delta * (value - self.mean)
+
+    def merge(self, other: "RunningMoments"):
+        if other.n == 0:
+            return
+        total = self.n + other.n
+        delta = other.mean - self.mean
+        self.m2 += other.m2 + delta * delta * self.n * other.n / total
+        self.mean += delta * other.n / total
+        self.n = total
+
+    @property
+    def variance(self) -> float:
+        return self.m2 / (self.n - 1) if self.n > 1 else 0.0
+
+    @property
+    def stddev(self) -> float:
+        return math.sqrt(self.variance)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"n": self.n, "media": self.mean, "m2": self.m2}
+
+    @classmethod
+    def from_dict(cls, data: Optional[Dict[str, Any]]) -> "RunningMoments":
+        if not data:
+            return cls()
+        return cls(data.get("n", 0), data.get("media", 0.0), data.get("m2", 0.0))
+
+class KLLSketch:
+    """Sketch de quantis KLL (Karnin, Lang e Liberty), combinável e serializável.
+
+    Mantém no máximo ~3k valores independentemente de quantos forem inseridos.
+    O erro de rank normalizado é O(1/k): com k=200 (padrão) fica em ~1,65% com
+    99% de confiança, ou seja, o quantil retornado para q tem rank real em
+    [q - 0,0165, q + 0,0165]. Abaixo de k valores o resultado é exato.
+    """
+
+    def __init__(self, k: int = 200, compactors: Optional[List[List[float]]] = None):
+        self.k = k
+        self.compactors: List[List[float]] = compactors or [[]]
+
+    def _capacity(self, level: int) -> int:
+        depth = len(self.compactors) - level - 1
+        return max(2, int(math.ceil(self.k * (2 / 3) ** depth)))
+
+    @property
+    def n(self) -> int:
+        return sum(len(items) << level for level, items in enumerate(self.compactors))
+
+    def add(self, value: float):
+        self.compactors[0].append(float(value))
+        self._compress()
+
+    def merge(self, other: "KLLSketch"):
+        while len(self.compactors) < len(other.compactors):
+            self.compactors.append([])
+        for level, items in enumerate(other.compactors):
+            self.compactors[level].extend(items)
+        self._compress()
+
+    def _compress(self):
+        level = 0
+        while level < len(self.compactors):
+            if len(self.compactors[level]) >= self._capacity(level):
+                if level + 1 == len(self.compactors):
+                    self.compactors.append([])
+                items = sorted(self.compactors[level])
+                # Com quantidade ímpar, o último item permanece no nível atual
+                keep = [items.pop()] if len(items) % 2 else []
+                offset = random.getrandbits(1)
+                self.compactors[level + 1].extend(items[offset::2])
+                self.compactors[level] = keep
+            level += 1
+
+    def _weighted(self) -> List[tuple]:
+        return sorted(
+            (value, 1 << level)
+            for level, items in enumerate(self.compactors)
+            for value in items
+        )
+
+    def quantile(self, q: float) -> Optional[float]:
+        """Valor cujo rank normalizado é aproximadamente q (0 <= q <= 1)"""
+        weighted = self._weighted()
+        if not weighted:
+            return None
+        total = sum(weight for _, weight in weighted)
+        target = q * total
+        seen = 0
+        for value, weight in weighted:
+            seen += weight
+            if seen >= target:
+                return value
+        return weighted[-1][0]
+
+    def quantiles(self, qs: List[float]) -> List[Optional[float]]:
+        return [self.quantile(q) for q in qs]
+
+    def rank(self, value: float) -> float:
+        """Fração aproximada de valores estritamente menores que `value`"""
+        weighted = self._weighted()
+        total = sum(weight for _, weight in weighted)
+        if total == 0:
+            return 0.0
+        return sum(weight for v, weight in weighted if v < value) / total
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"k": self.k, "niveis": self.compactors}
+
+    @classmethod
+    def from_dict(cls, data: Optional[Dict[str, Any]], k: int = 200) -> "KLLSketch":
+        if not data:
+            return cls(k)
+        return cls(data.get("k", k), [list(items) for items in data.get("niveis", [[]])])
+
+class SpaceSaving:
+    """Top-k aproximado (Metwally et al.) com memória fixa de `capacity` contadores.
+
+    Qualquer item com frequência maior que n/capacity está garantidamente presente;
+    a contagem reportada superestima a real em no máximo o `erro` do contador.
+    """
+
+    def __init__(self, capacity: int = 50, counters: Optional[Dict[str, List[int]]] = None):
+        self.capacity = capacity
+        self.counters: Dict[str, List[int]] = counters or {}
+
+    def add(self, item: str, weight: int = 1):
+        if item in self.counters:
+            self.counters[item][0] += weight
+        elif len(self.counters) < self.capacity:
+            self.counters[item] = [weight, 0]
+        else:
+            # Substitui o item menos frequente, herdando sua contagem como erro
+            victim = min(self.counters, key=lambda key: self.counters[key][0])
+            floor = self.counters.pop(victim)[0]
+            self.counters[item] = [floor + weight, floor]
+
+    def top(self, k: int) -> List[tuple]:
+        """Os k itens mais frequentes como (item, contagem)"""
+        ranked = sorted(self.counters.items(), key=lambda entry: (-entry[1][0], entry[0]))
+        return [(item, count) for item, (count, _) in ranked[:k]]
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"capacidade": self.capacity, "contadores": self.counters}
+
+    @classmethod
+    def from_dict(cls, data: Optional[Dict[str, Any]], capacity: int = 50) -> "SpaceSaving":
+        if not data:
+            return cls(capacity)
+        return cls(data.get("capacidade", capacity), {k: list(v) for k, v in data.get("contadores", {}).items()})
@@ -2,6 +2,32 @@ import unicodedata
 import re
 STOPWORDS = {"de", "para", "com", "em", "o", "a", "os", "as", "um", "uma"}
 
+# Palavras sem valor como tema de um objetivo financeiro (já normalizadas: minúsculas, sem acento).
+# Usadas só na extração de palavras-chave; a classificação continua vendo o texto completo.
+PALAVRAS_VAZIAS = STOPWORDS | {
+    # Artigos, preposições, contrações e conjunções
+    "ao", "aos", "ate", "apos", "sobre", "entre", "sem", "sob", "pelo", "pela", "pelos", "pelas",
+    "do", "da", "dos", "das", "no", "na", "nos", "nas", "num", "numa", "dum", "duma",
+    "e", "ou", "mas", "porem", "pois", "porque", "que", "se", "como", "quando", "onde", "entao",
+    "tambem", "mais", "menos", "muito", "muita", "muitos", "muitas", "pouco", "pouca", "bem", "ainda",
+    "ja", "so", "apenas", "agora", "hoje", "depois", "antes", "sempre", "nunca", "algum", "alguma",
+    "alguns", "algumas", "todo", "toda", "todos", "todas", "cada", "outro", "outra", "outros", "outras",
+    "mesmo", "mesma", "proprio", "propria", "proprios", "proprias", "isso", "isto", "esse", "essa",
+    "este", "esta", "aquele", "aquela", "qual", "quais", "quanto", "quanta",
+    # Pronomes e possessivos
+    "eu", "me", "mim", "comigo", "voce", "voces", "ele", "ela", "eles", "elas", "lhe",
+    "meu", "minha", "meus", "minhas", "nosso", "nossa", "nossos", "nossas", "seu", "sua", "seus", "suas",
+    # Verbos frequentes na forma de pedir ou descrever um objetivo
+    "quero", "queria", "querer", "gostaria", "gosto", "preciso", "precisar", "pretendo", "desejo",
+    "sonho", "planejo", "planejar", "tenho", "ter", "ser", "estar", "estou", "sou", "fazer", "faco",
+    "poder", "posso", "conseguir", "consigo", "comecar", "aprender", "saber", "entender", "ajuda",
+    "ajudar", "investir", "invisto", "aplicar", "comprar", "juntar", "guardar", "ganhar", "melhorar",
+    "montar", "formar", "criar", "usar", "pagar", "ficar",
+    # Termos genéricos em qualquer objetivo financeiro
+    "dinheiro", "investimento", "investimentos", "objetivo", "objetivos", "forma", "maneira", "coisa",
+    "coisas", "vida", "futuro", "ano", "anos", "mes", "meses", "dia", "dias", "reais", "valor", "mil"
+}
+
 def normalizar_texto(texto: str) -> str:
     """Normaliza texto removendo acentos, stopwords e caracteres especiais"""
     texto = texto.lower()
@@ -23,3 +49,12 @@ def validate_input_regex(text: str, pattern: str) -> bool:
     """Valida um texto contra um padrão regex."""
     return bool(re.match(pattern, text))
 
+def extrair_palavras_chave(texto: str, tamanho_minimo: int = 4) -> list:
+    """Extrai palavras-chave únicas de um texto normalizado, na ordem em que aparecem"""
+    palavras = re.findall(r"[a-z0-9]+", normalizar_texto(texto))
+    vistas = []
+    for palavra in palavras:
+        if len(palavra) >= tamanho_minimo and palavra not in PALAVRAS_VAZIAS and not palavra.isdigit() and palavra not in vistas:
+            vistas.append(palavra)
+    return vistas
+
@@ -5,7 +5,17 @@ from app.database.connection import connect_to_mongo, close_mongo_connection, mo
 #from app.api.routes.content import router as content_router
 from app.api.routes.content import router as content_router  # ← CORRIGIDO
 from app.core.config.settings import settings
-from app.api.services.ia_generator import IAGenerator
+from app.api.services.ia_generator import IAGenerator, llm_limiter
+from app.api.services.analytics_engine import AnalyticsEngine
+from app.api.services.analytics_snapshot import snapshot
+from app.api.services.investment_calculator import shutdown_process_pool, simulation_cache, monte_carlo_limiter
+from app.api.services.selic_api import close_http_client, run_selic_refresher, selic_status
+from app.api.services.selic_store import selic_store
+from app.api.services.content_cache import content_cache, MongoContentCacheBackend
+from app.api.services.prompt_budget import token_usage
+from app.api.services.write_behind import write_behind
+from app.api.services.memory_manager import MemoryManager, memory_cache
+import asyncio
 import os
 
 @asynccontextmanager
@@ -13,10 +23,35 @@ async def lifespan(app: FastAPI):
     # Evento de startup
     print("Iniciando a aplicação...")
     await connect_to_mongo()
-    
-    # Validar conexão com a IA
+    write_behind.start()
+
+    # Garantir índices usados nas consultas
+    try:
+        await AnalyticsEngine.ensure_indexes()
+        await MemoryManager.ensure_indexes()
+        if isinstance(content_cache.backend, MongoContentCacheBackend):
+            await content_cache.backend.ensure_indexes()
+    except Exception as e:
+        print(f"Aviso ao criar índices: {e}")
+
+    # Carregar a série Selic local e mantê-la atualizada em segundo plano
+    try:
+        await selic_store.ensure_indexes()
+        await selic_store.load()
+    except Exception as e:
+        print(f"Aviso ao carregar série Selic: {e}")
+    selic_refresher = asyncio.create_task(run_selic_refresher())
+
+    # Snapshot colunar da análise comparativa, recarregado fora do caminho das requisições
+    snapshot_refresher = None
+    if settings.analytics_source == "columnar":
+        snapshot_refresher = asyncio.create_task(snapshot.run_refresher())
+
+    # Criar o gerador de IA compartilhado (uma vez, lido pela dependência get_ia_generator) e validar a conexão
+    app.state.ia_generator = None
     try:
         ia_gen = IAGenerator()
+        app.state.ia_generator = ia_gen
         if not await ia_gen.check_connection():
             print("Aviso: Conexão com o serviço de IA não estabelecida. Verifique a chave de API.")
     except Exception as e:
@@ -25,6 +60,12 @@ async def lifespan(app: FastAPI):
     yield
     # Evento de shutdown
     print("Encerrando a aplicação...")
+    selic_refresher.cancel()
+    if snapshot_refresher:
+        snapshot_refresher.cancel()
+    await write_behind.close(settings.write_behind_shutdown_timeout_seconds)
+    shutdown_process_pool()
+    await close_http_client()
     await close_mongo_connection()
 
 app = FastAPI(
@@ -70,10 +111,12 @@ async def health_check():
     except Exception:
         mongo_status = "error"
 
-    # Verificar IA (mais tolerante)
+    # Verificar IA (mais tolerante): backend inválido ou que falhou ao ser criado no lifespan vira "error"
+    llm_stats = None
     try:
-        ia_gen = IAGenerator()
+        ia_gen = app.state.ia_generator
         ia_status = "connected" if await ia_gen.check_connection() else "disconnected"
+        llm_stats = ia_gen.llm.stats()
     except Exception:
         ia_status = "error"
 
@@ -81,6 +124,16 @@ async def health_check():
         "status": "ok" if mongo_status == "connected" else "degraded",
         "mongodb": mongo_status,
         "ia_service": ia_status,
+        "llm_concorrencia": llm_limiter.stats(),
+        "llm": llm_stats,
+        "tokens": token_usage.stats(),
+        "gravacao_em_segundo_plano": write_behind.stats(),
+        "content_cache": content_cache.stats(),
+        "memory_cache": memory_cache.stats(),
+        "simulation_cache": simulation_cache.stats(),
+        "monte_carlo_concorrencia": monte_carlo_limiter.stats(),
+        "analytics_snapshot": snapshot.stats() if settings.analytics_source == "columnar" else None,
+        "selic": selic_status(),
         "version": "4.0.0"
     }
 
@@ -0,0 +1,49 @@
+"""Utilitários compartilhados pelos benchmarks (execute a partir da raiz: python -m benchmarks.<nome>)"""
+import os
+import statistics
+import time
+from typing import Dict, List
+
+# Os módulos da aplicação leem Settings na importação
+os.environ.setdefault("MONGODB_URL", "mongodb://localhost:27017")
+
+BENCHMARK_DATABASE = "finance_db_benchmark"
+
+async def connect_benchmark_database():
+    """Conecta ao MongoDB de MONGODB_URL, usando um banco separado do da aplicação"""
+    from app.database.connection import connect_to_mongo, mongodb
+    await connect_to_mongo()
+    mongodb.database = mongodb.client.get_database(os.getenv("BENCHMARK_DATABASE", BENCHMARK_DATABASE))
+    return mongodb.database
+
+async def close_benchmark_database(drop: bool = True):
+    from app.database.connection import close_mongo_connection, mongodb
+    if drop and mongodb.client is not None:
+        await mongodb.client.drop_database(mongodb.database.name)
+    await close_mongo_connection()
+
+def summarize(samples: List[float]) -> Dict[str, float]:
+    """Resumo de latências (em segundos) em milissegundos"""
+    ordered = sorted(samples)
+    p95 = ordered[min(len(ordered) - 1, int(0.95 * len(ordered)))]
+    return {
+        "n": len(ordered),
+        "media_ms": round(1000 * statistics.mean(ordered), 4),
+        "p50_ms": round(1000 * statistics.median(ordered), 4),
+        "p95_ms": round(1000 * p95, 4),
+        "max_ms": round(1000 * ordered[-1], 4)
+    }
+
+class Timer:
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.elapsed = time.perf_counter() - self.started
+
+def print_table(rows: List[Dict], columns: List[str]):
+    widths = {c: max(len(c), *(len(str(row.get(c, ""))) for row in rows)) for c in columns}
+    print("  ".join(c.ljust(widths[c]) for c in columns))
+    for row in rows:
+        print("  ".join(str(row.get(c, "")).ljust(widths[c]) for c in columns))
@@ -0,0 +1,95 @@
+"""Simulações por segundo: /simular-investimento (uma por requisição) vs /simular-investimento/lote.
+
+Sem --url, chama a aplicação em processo (httpx + ASGI, sem lifespan nem MongoDB). Com --url,
+mede um servidor já em execução, p.ex. `uvicorn app.main:app --workers 1`. Os parâmetros são
+sorteados, para que o cache de simulações não responda pelo endpoint individual.
+
+    python -m benchmarks.batch_simulation [--simulacoes 2000] [--lote 1000] [--url http://127.0.0.1:8000]
+"""
+import argparse
+import asyncio
+import json
+import random
+import httpx
+from benchmarks._common import Timer, print_table
+
+def random_simulations(count: int, rng: random.Random):
+    return [
+        {
+            "valor_inicial": round(rng.uniform(0, 100_000), 2),
+            "aporte_mensal": round(rng.uniform(0, 5_000), 2),
+            "tempo_anos": rng.randint(1, 40),
+            "taxa_anual": round(rng.uniform(2, 20), 2),
+            "perfil_risco": rng.choice(["conservador", "moderado", "agressivo"])
+        }
+        for _ in range(count)
+    ]
+
+async def run_single(client: httpx.AsyncClient, simulations, concurrency: int) -> int:
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def post(simulation):
+        async with semaphore:
+            response = await client.post("/api/simular-investimento", json=simulation)
+            response.raise_for_status()
+
+    await asyncio.gather(*(post(simulation) for simulation in simulations))
+    return len(simulations)
+
+async def run_batch(client: httpx.AsyncClient, simulations, batch_size: int, columnar: bool) -> int:
+    received = 0
+    for start in range(0, len(simulations), batch_size):
+        chunk = simulations[start:start + batch_size]
+        if columnar:
+            payload = {
+                "valores_iniciais": [s["valor_inicial"] for s in chunk],
+                "aportes_mensais": [s["aporte_mensal"] for s in chunk],
+                "tempos_anos": [s["tempo_anos"] for s in chunk],
+                "taxas_anuais": [s["taxa_anual"] for s in chunk]
+            }
+        else:
+            payload = {"simulacoes": chunk}
+        async with client.stream("POST", "/api/simular-investimento/lote", json=payload) as response:
+            response.raise_for_status()
+            async for line in response.aiter_lines():
+                if line:
+                    json.loads(line)
+                    received += 1
+    return received
+
+async def main(count: int, batch_size: int, concurrency: int, url: str, seed: int):
+    simulations = random_simulations(count, random.Random(seed))
+    if url:
+        client = httpx.AsyncClient(base_url=url, timeout=60)
+    else:
+        from app.main import app
+        client = httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://benchmark", timeout=60)
+
+    rows = []
+    async with client:
+        cases = [
+            ("individual", lambda: run_single(client, simulations, concurrency)),
+            ("lote", lambda: run_batch(client, simulations, batch_size, columnar=False)),
+            ("lote_colunar", lambda: run_batch(client, simulations, batch_size, columnar=True))
+        ]
+        for name, case in cases:
+            with Timer() as timer:
+                done = await case()
+            rows.append({
+                "endpoint": name,
+                "simulacoes": done,
+                "requisicoes": done if name == "individual" else -(-done // batch_size),
+                "segundos": round(timer.elapsed, 3),
+                "simulacoes_por_s": round(done / timer.elapsed, 1)
+            })
+    print_table(rows, ["endpoint", "simulacoes", "requisicoes", "segundos", "simulacoes_por_s"])
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--simulacoes", type=int, default=2000)
+    parser.add_argument("--lote", type=int, default=1000)
+    parser.add_argument("--concorrencia", type=int, default=32)
+    parser.add_argument("--url", default="")
+    parser.add_argument("--semente", type=int, default=42)
+    args = parser.parse_args()
+    asyncio.run(main(args.simulacoes, args.lote, args.concorrencia, args.url, args.semente))
@@ -0,0 +1,87 @@
+"""CPU por requisição da análise comparativa: snapshot colunar (NumPy) vs documentos em Python.
+
+Gera usuários sintéticos em memória (sem MongoDB) e mede, para idades e rendas sorteadas,
+o tempo de CPU de:
+  - documentos: seleção dos similares e estatísticas sobre listas de dicts, como no caminho "peers"
+  - colunar: `ColumnarSnapshot.compare` (máscaras e reduções vetorizadas)
+Também informa o custo de uma recarga completa do snapshot, que roda em segundo plano.
+
+    python -m benchmarks.columnar_snapshot [--tamanhos 100000,1000000]
+"""
+import argparse
+import asyncio
+import random
+import statistics
+import time
+from types import SimpleNamespace
+from bson import ObjectId
+from benchmarks._common import summarize, print_table
+
+PROFILES = ["conservador", "moderado", "agressivo", None]
+
+def synthetic_users(count: int, rng: random.Random):
+    return [
+        {
+            "_id": ObjectId(),
+            "idade": rng.randint(18, 80),
+            "renda_mensal": round(rng.lognormvariate(8.3, 0.7), 2),
+            "perfil_classificado": rng.choice(PROFILES)
+        }
+        for _ in range(count)
+    ]
+
+def cpu_samples(func, probes):
+    samples = []
+    for user in probes:
+        started = time.process_time()
+        func(user)
+        samples.append(time.process_time() - started)
+    return samples
+
+async def main(sizes, probes: int, seed: int):
+    from app.api.services import analytics_snapshot
+    from app.api.services.analytics_engine import AnalyticsEngine
+
+    engine = AnalyticsEngine()
+    rng = random.Random(seed)
+    rows = []
+    for size in sizes:
+        users = synthetic_users(size, rng)
+        queries = [{"idade": rng.randint(18, 80), "renda_mensal": round(rng.lognormvariate(8.3, 0.7), 2)} for _ in range(probes)]
+
+        async def find_all_documents(*args, **kwargs):
+            return users
+        analytics_snapshot.mongodb_crud = SimpleNamespace(find_all_documents=find_all_documents)
+        snapshot = analytics_snapshot.ColumnarSnapshot()
+        started = time.process_time()
+        await snapshot.refresh()
+        refresh_ms = round(1000 * (time.process_time() - started), 1)
+
+        def documents(user):
+            margin = 0.3 * max(user["renda_mensal"], 1)
+            similar = [
+                doc for doc in users
+                if abs(doc["idade"] - user["idade"]) <= 5 and abs(doc["renda_mensal"] - user["renda_mensal"]) <= margin
+            ]
+            # Mesmas estatísticas de _analyze_age_group e _analyze_income
+            ages = [doc["idade"] for doc in similar]
+            incomes = [doc["renda_mensal"] for doc in similar]
+            if not ages:
+                return None
+            return (statistics.mean(ages), statistics.median(ages), statistics.mean(incomes),
+                    engine._get_income_quartile(user["renda_mensal"], incomes))
+
+        def columnar(user):
+            return snapshot.compare(user["idade"], user["renda_mensal"])
+
+        rows.append({"usuarios": size, "caminho": "documentos", **summarize(cpu_samples(documents, queries))})
+        rows.append({"usuarios": size, "caminho": "colunar", "recarga_ms": refresh_ms, **summarize(cpu_samples(columnar, queries))})
+    print_table(rows, ["usuarios", "caminho", "n", "media_ms", "p50_ms", "p95_ms", "max_ms", "recarga_ms"])
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--tamanhos", default="100000,300000,1000000")
+    parser.add_argument("--consultas", type=int, default=50)
+    parser.add_argument("--semente", type=int, default=42)
+    args = parser.parse_args()
+    asyncio.run(main([int(s) for s in args.tamanhos.split(",")], args.consultas, args.semente))
@@ -0,0 +1,86 @@
+"""Custo por requisição de obter o gerador de IA: instância nova por requisição vs instância do processo.
+
+Mede o caminho da dependência como o FastAPI o executa:
+  - antes: `Depends(IAGenerator)`, dependência síncrona rodada no threadpool, com
+    genai.configure e um GenerativeModel novos a cada requisição;
+  - depois: `Depends(get_ia_generator)`, dependência assíncrona que lê o gerador criado
+    no lifespan em `app.state`, no próprio event loop.
+Etapa "dependencia": só a resolução da dependência. Etapa "requisicao": uma requisição
+completa em processo (httpx + ASGI) a uma rota que só depende do gerador. Com GEMINI_API_KEY
+e --chamadas N, faz também N chamadas reais em cada modo, incluindo a abertura do transporte
+em cada modelo novo.
+
+    python -m benchmarks.ia_generator_lifecycle [--requisicoes 2000] [--chamadas 0]
+"""
+import argparse
+import asyncio
+import time
+import httpx
+from benchmarks._common import summarize, print_table
+
+PROMPT = "Explique juros compostos em uma frase."
+
+async def timed(func, repetitions: int):
+    samples = []
+    for _ in range(repetitions):
+        started = time.perf_counter()
+        await func()
+        samples.append(time.perf_counter() - started)
+    return samples
+
+def build_app():
+    """Aplicação mínima com uma rota por modo; o gerador compartilhado fica em app.state, como no lifespan"""
+    from fastapi import Depends, FastAPI
+    from app.api.services.ia_generator import IAGenerator, get_ia_generator
+
+    app = FastAPI()
+    app.state.ia_generator = IAGenerator()
+
+    @app.get("/antes")
+    async def before(generator: IAGenerator = Depends(IAGenerator)):
+        return {"backend": generator.llm.primary.name}
+
+    @app.get("/depois")
+    async def after(generator: IAGenerator = Depends(get_ia_generator)):
+        return {"backend": generator.llm.primary.name}
+
+    return app
+
+async def main(requests: int, calls: int):
+    from app.core.config.settings import settings
+    settings.llm_backend = "gemini"
+    settings.llm_fallback_backend = ""
+    from starlette.concurrency import run_in_threadpool
+    from starlette.requests import Request
+    from app.api.services.ia_generator import IAGenerator, get_ia_generator
+
+    app = build_app()
+    request = Request({"type": "http", "app": app})
+    # Como o FastAPI resolve cada dependência: síncrona no threadpool, assíncrona aguardada direto
+    dependencies = [
+        ("antes", lambda: run_in_threadpool(IAGenerator)),
+        ("depois", lambda: get_ia_generator(request))
+    ]
+    rows = [{"modo": name, "etapa": "dependencia", **summarize(await timed(dependency, requests))} for name, dependency in dependencies]
+
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://benchmark") as client:
+        for name, _ in dependencies:
+            rows.append({"modo": name, "etapa": "requisicao", **summarize(await timed(lambda: client.get(f"/{name}"), requests))})
+
+    if calls:
+        if not settings.gemini_api_key:
+            print("GEMINI_API_KEY ausente: chamadas reais ignoradas")
+        else:
+            for name, dependency in dependencies:
+                async def call():
+                    generator = await dependency()
+                    await generator.llm.generate(PROMPT)
+                rows.append({"modo": name, "etapa": "chamada ao modelo", **summarize(await timed(call, calls))})
+    print_table(rows, ["modo", "etapa", "n", "media_ms", "p50_ms", "p95_ms", "max_ms"])
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requisicoes", type=int, default=2000)
+    parser.add_argument("--chamadas", type=int, default=0)
+    args = parser.parse_args()
+    asyncio.run(main(args.requisicoes, args.chamadas))
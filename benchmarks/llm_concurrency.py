@@ -0,0 +1,64 @@
+"""Vazão da geração de conteúdo com um modelo lento simulado, variando `llm_max_concurrency`.
+
+Usa o `LocalStubBackend` (latência fixa, sem cota) atrás do `ConcurrencyLimiter` de
+`IAGenerator.generate_content` e dispara requisições simultâneas. Com a chamada assíncrona,
+a vazão deve crescer com o limite até o número de requisições em voo. Para comparação, o
+caso "bloqueante" simula a chamada síncrona anterior (time.sleep no event loop), cuja vazão
+não passa de 1/latência qualquer que seja o limite.
+
+    python -m benchmarks.llm_concurrency [--limites 1,2,4,8,16] [--requisicoes 64] [--latencia 0.25]
+"""
+import argparse
+import asyncio
+import time
+from benchmarks._common import Timer, print_table
+
+USER = {"nome": "Benchmark", "idade": 30, "renda_mensal": 5000.0}
+
+async def run(limit: int, requests: int, latency: float, blocking: bool):
+    from app.api.services import ia_generator
+    from app.api.services.llm_backends import LLMClient, LocalStubBackend
+    from app.core.utils.concurrency import ConcurrencyLimiter
+
+    class BlockingStubBackend(LocalStubBackend):
+        name = "stub-bloqueante"
+
+        async def generate(self, prompt: str) -> str:
+            time.sleep(self.latency)  # Como o antigo model.generate_content síncrono
+            return self._text(prompt)
+
+    backend_class = BlockingStubBackend if blocking else LocalStubBackend
+    ia_generator.llm_limiter = ConcurrencyLimiter(limit)
+    generator = ia_generator.IAGenerator.__new__(ia_generator.IAGenerator)
+    generator.llm = LLMClient(backend_class(latency=latency, tokens_per_second=0))
+
+    with Timer() as timer:
+        await asyncio.gather(*(
+            generator.generate_content("moderado", USER, f"objetivo {i}")
+            for i in range(requests)
+        ))
+    stats = ia_generator.llm_limiter.stats()
+    return {
+        "modelo": "bloqueante" if blocking else "assincrono",
+        "limite": limit,
+        "requisicoes": requests,
+        "segundos": round(timer.elapsed, 3),
+        "req_por_s": round(requests / timer.elapsed, 1),
+        "espera_media_ms": stats["espera_media_ms"],
+        "espera_maxima_ms": stats["espera_maxima_ms"]
+    }
+
+async def main(limits, requests: int, latency: float):
+    from app.api.services.content_cache import content_cache
+    content_cache.backend = None  # Toda requisição chega ao modelo
+    rows = [await run(limit, requests, latency, blocking=False) for limit in limits]
+    rows += [await run(limit, min(requests, 16), latency, blocking=True) for limit in (1, max(limits))]
+    print_table(rows, ["modelo", "limite", "requisicoes", "segundos", "req_por_s", "espera_media_ms", "espera_maxima_ms"])
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--limites", default="1,2,4,8,16")
+    parser.add_argument("--requisicoes", type=int, default=64)
+    parser.add_argument("--latencia", type=float, default=0.25)
+    args = parser.parse_args()
+    asyncio.run(main([int(s) for s in args.limites.split(",")], args.requisicoes, args.latencia))
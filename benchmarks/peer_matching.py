@@ -0,0 +1,85 @@
+"""Latência das estatísticas de usuários similares (agregação por faixa no índice (idade, renda_mensal)).
+
+Popula `usuarios` em um banco de benchmark com 1k a 1M usuários sintéticos e mede
+`AnalyticsEngine._peer_statistics` para idades e rendas sorteadas. Com o índice, a latência
+deve acompanhar o número de similares, não o tamanho da coleção, e só os agregados voltam
+do servidor. Com --varredura também mede a varredura completa anterior (até 100k usuários).
+
+    MONGODB_URL=mongodb://localhost:27017 python -m benchmarks.peer_matching [--tamanhos 1000,10000] [--varredura]
+"""
+import argparse
+import asyncio
+import random
+from benchmarks._common import connect_benchmark_database, close_benchmark_database, summarize, print_table, Timer
+
+INSERT_BATCH = 10_000
+SCAN_LIMIT = 100_000
+
+def synthetic_users(count: int, rng: random.Random):
+    for _ in range(count):
+        yield {
+            "nome": f"usuario-{rng.getrandbits(48):x}",
+            "idade": rng.randint(18, 80),
+            "renda_mensal": round(rng.lognormvariate(8.3, 0.7), 2)
+        }
+
+async def grow_to(database, size: int, current: int, rng: random.Random) -> int:
+    batch = []
+    for user in synthetic_users(size - current, rng):
+        batch.append(user)
+        if len(batch) == INSERT_BATCH:
+            await database.usuarios.insert_many(batch, ordered=False)
+            batch = []
+    if batch:
+        await database.usuarios.insert_many(batch, ordered=False)
+    return size
+
+async def full_scan(database, user: dict, max_diff_age: int = 5, max_diff_income: float = 0.3):
+    """Comportamento anterior: lê `usuarios` inteira e filtra em Python"""
+    similar = []
+    async for doc in database.usuarios.find({}):
+        if abs(doc["idade"] - user["idade"]) <= max_diff_age and \
+                abs(doc["renda_mensal"] - user["renda_mensal"]) / max(user["renda_mensal"], 1) <= max_diff_income:
+            similar.append(doc)
+    return similar
+
+async def main(sizes, probes: int, scan: bool, seed: int):
+    from app.api.services.analytics_engine import AnalyticsEngine
+    database = await connect_benchmark_database()
+    rng = random.Random(seed)
+    try:
+        await database.usuarios.delete_many({})
+        await AnalyticsEngine.ensure_indexes()
+        engine = AnalyticsEngine()
+        rows, current = [], 0
+        for size in sorted(sizes):
+            current = await grow_to(database, size, current, rng)
+            queries = [next(synthetic_users(1, rng)) for _ in range(probes)]
+            await engine._peer_statistics(queries[0])  # aquecimento
+            samples, peers = [], 0
+            for user in queries:
+                with Timer() as timer:
+                    stats = await engine._peer_statistics(user)
+                samples.append(timer.elapsed)
+                peers += stats["total"][0]["total"] if stats and stats["total"] else 0
+            rows.append({"usuarios": size, "caminho": "indice", "similares_medio": peers // probes, **summarize(samples)})
+
+            if scan and size <= SCAN_LIMIT:
+                samples = []
+                for user in queries[:max(5, probes // 10)]:
+                    with Timer() as timer:
+                        await full_scan(database, user)
+                    samples.append(timer.elapsed)
+                rows.append({"usuarios": size, "caminho": "varredura", **summarize(samples)})
+        print_table(rows, ["usuarios", "caminho", "similares_medio", "n", "media_ms", "p50_ms", "p95_ms", "max_ms"])
+    finally:
+        await close_benchmark_database()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--tamanhos", default="1000,10000,100000,1000000")
+    parser.add_argument("--consultas", type=int, default=200)
+    parser.add_argument("--varredura", action="store_true")
+    parser.add_argument("--semente", type=int, default=42)
+    args = parser.parse_args()
+    asyncio.run(main([int(s) for s in args.tamanhos.split(",")], args.consultas, args.varredura, args.semente))
@@ -0,0 +1,4 @@
+import os
+
+# Settings exige MONGODB_URL na importação; os testes não abrem conexão com o banco
+os.environ.setdefault("MONGODB_URL", "mongodb://localhost:27017")
@@ -0,0 +1,150 @@
+import asyncio
+import copy
+from collections import Counter, defaultdict
+from types import SimpleNamespace
+from bson import ObjectId
+from pymongo import ReplaceOne
+
+def _get(document: dict, path: str):
+    for part in path.split("."):
+        if not isinstance(document, dict) or part not in document:
+            return None
+        document = document[part]
+    return document
+
+def _set(document: dict, path: str, value):
+    *parents, last = path.split(".")
+    for part in parents:
+        document = document.setdefault(part, {})
+    document[last] = value
+
+def _matches(document: dict, query: dict) -> bool:
+    for field, expected in (query or {}).items():
+        value = _get(document, field)
+        if isinstance(expected, dict) and any(op.startswith("$") for op in expected):
+            for op, operand in expected.items():
+                if op == "$in" and value not in operand:
+                    return False
+                if op == "$ne" and value == operand:
+                    return False
+                if op == "$lt" and not (value is not None and value < operand):
+                    return False
+        elif value != expected:
+            return False
+    return True
+
+class FakeMongoCrud:
+    """Substituto em memória de `mongodb_crud` para os testes: conta as operações por
+    (função, coleção) e cede o event loop a cada chamada para intercalar requisições concorrentes."""
+
+    def __init__(self):
+        self.collections = defaultdict(list)
+        self.calls = Counter()
+
+    async def _op(self, name: str, collection: str):
+        self.calls[(name, collection)] += 1
+        await asyncio.sleep(0)
+
+    def _find(self, collection: str, query: dict):
+        return [doc for doc in self.collections[collection] if _matches(doc, query)]
+
+    async def find_document(self, collection: str, query: dict, projection: dict = None):
+        await self._op("find_document", collection)
+        found = self._find(collection, query)
+        return copy.deepcopy(found[0]) if found else None
+
+    async def find_all_documents(self, collection: str, query: dict = None, projection: dict = None):
+        await self._op("find_all_documents", collection)
+        return copy.deepcopy(self._find(collection, query))
+
+    async def create_document(self, collection: str, document: dict):
+        await self._op("create_document", collection)
+        document = {"_id": ObjectId(), **copy.deepcopy(document)}
+        self.collections[collection].append(document)
+        return str(document["_id"])
+
+    async def create_documents(self, collection: str, documents: list):
+        await self._op("create_documents", collection)
+        return [str(self._insert(collection, document)) for document in documents]
+
+    def _insert(self, collection: str, document: dict):
+        document = {"_id": ObjectId(), **copy.deepcopy(document)}
+        self.collections[collection].append(document)
+        return document["_id"]
+
+    async def update_document(self, collection: str, query: dict, new_values: dict):
+        return await self.apply_update(collection, query, {"$set": new_values})
+
+    async def apply_update(self, collection: str, query: dict, update: dict, upsert: bool = False):
+        await self._op("apply_update", collection)
+        return self._apply(collection, query, update, upsert)
+
+    async def find_one_and_update(self, collection: str, query: dict, update: dict, projection: dict = None):
+        await self._op("find_one_and_update", collection)
+        found = self._find(collection, query)
+        before = copy.deepcopy(found[0]) if found else None
+        self._apply(collection, query, update, False)
+        return before
+
+    def _apply(self, collection: str, query: dict, update: dict, upsert: bool):
+        found = self._find(collection, query)
+        if not found:
+            if not upsert:
+                return 0
+            document = {k: v for k, v in query.items() if not isinstance(v, dict)}
+            self._insert(collection, document)
+            document = self.collections[collection][-1]
+            for path, value in update.get("$setOnInsert", {}).items():
+                _set(document, path, copy.deepcopy(value))
+        else:
+            document = found[0]
+        for path, value in update.get("$set", {}).items():
+            _set(document, path, copy.deepcopy(value))
+        for path in update.get("$unset", {}):
+            *parents, last = path.split(".")
+            parent = _get(document, ".".join(parents)) if parents else document
+            if isinstance(parent, dict):
+                parent.pop(last, None)
+        for path, value in update.get("$inc", {}).items():
+            _set(document, path, (_get(document, path) or 0) + value)
+        for path, value in update.get("$push", {}).items():
+            items = _get(document, path) or []
+            items = items + copy.deepcopy(value.get("$each", [value]) if isinstance(value, dict) else [value])
+            if isinstance(value, dict) and "$slice" in value:
+                items = items[value["$slice"]:] if value["$slice"] < 0 else items[:value["$slice"]]
+            _set(document, path, items)
+        return 1 if found else 0
+
+    async def iterate_documents(self, collection: str, query: dict = None, projection: dict = None, batch_size: int = 500):
+        await self._op("iterate_documents", collection)
+        for document in self._find(collection, query):
+            yield copy.deepcopy(document)
+
+    async def bulk_write(self, collection: str, operations: list, ordered: bool = False):
+        await self._op("bulk_write", collection)
+        matched = 0
+        for operation in operations:
+            if isinstance(operation, ReplaceOne):
+                found = self._find(collection, operation._filter)
+                if found:
+                    found[0].clear()
+                    found[0].update(copy.deepcopy(operation._doc))
+                    matched += 1
+            else:
+                matched += self._apply(collection, operation._filter, operation._doc, operation._upsert)
+        return SimpleNamespace(matched_count=matched)
+
+    async def aggregate(self, collection: str, pipeline: list):
+        await self._op("aggregate", collection)
+        return []
+
+    async def create_index(self, collection: str, keys: list, **kwargs):
+        await self._op("create_index", collection)
+
+    def install(self, monkeypatch):
+        """Substitui as funções do módulo `mongodb_crud` usado por toda a aplicação"""
+        from app.api.services import mongodb_crud
+        for name in ("find_document", "find_all_documents", "iterate_documents", "create_document", "create_documents",
+                     "update_document", "apply_update", "find_one_and_update", "bulk_write", "aggregate", "create_index"):
+            monkeypatch.setattr(mongodb_crud, name, getattr(self, name))
+        return self
@@ -0,0 +1,95 @@
+import asyncio
+import pytest
+from app.api.services import cohort_stats
+from app.api.services.cohort_stats import CohortStatsStore, COHORT_COLLECTION
+from app.api.services.write_behind import WriteBehindQueue
+from app.core.utils.text_processing import extrair_palavras_chave
+from tests.fake_mongo import FakeMongoCrud
+
+@pytest.fixture
+def crud(monkeypatch):
+    fake = FakeMongoCrud()
+    monkeypatch.setattr(cohort_stats, "mongodb_crud", fake)
+    return fake
+
+def test_concurrent_new_users_are_all_counted(crud):
+    store = CohortStatsStore()
+
+    async def scenario():
+        user_ids = [await crud.create_document("usuarios", {"idade": 30, "renda_mensal": 4000.0}) for _ in range(20)]
+        await asyncio.gather(*(
+            store.record_user(user_id, None, 30, 4000.0, "moderado", "Quero comprar minha casa própria")
+            for user_id in user_ids
+        ))
+
+    asyncio.run(scenario())
+    cohort = crud.collections[COHORT_COLLECTION][0]
+    marked = [user for user in crud.collections["usuarios"] if user.get("perfil_classificado") == "moderado"]
+    assert cohort["total"] == 20
+    assert cohort["perfis"] == {"moderado": 20}
+    assert cohort["idades"] == {"30": 20}
+    assert len(marked) == 20
+
+def test_profile_not_marked_when_counters_fail(crud):
+    store = CohortStatsStore()
+
+    apply_update = crud.apply_update
+
+    async def failing_update(collection, *args, **kwargs):
+        if collection == COHORT_COLLECTION:
+            raise RuntimeError("primário indisponível")
+        return await apply_update(collection, *args, **kwargs)
+
+    async def scenario():
+        user_id = await crud.create_document("usuarios", {"idade": 30, "renda_mensal": 4000.0})
+        crud.apply_update = failing_update
+        return await store.record_user(user_id, None, 30, 4000.0, "agressivo")
+
+    assert asyncio.run(scenario()) is False
+    assert crud.collections["usuarios"][0].get("perfil_classificado") is None
+
+def test_stale_profile_changes_applied_once(crud):
+    """Duas requisições do mesmo usuário antes do flush: ambas leram o perfil antigo"""
+    store = CohortStatsStore()
+    write_behind = WriteBehindQueue(max_size=10, batch_size=10, flush_interval=0.01)
+
+    async def scenario():
+        user_id = await crud.create_document("usuarios", {"idade": 30, "renda_mensal": 4000.0})
+        await store.record_user(user_id, None, 30, 4000.0, "moderado")
+        previous_user = await crud.find_document("usuarios", {})
+
+        write_behind.start()
+        for perfil in ("agressivo", "agressivo"):
+            await write_behind.call(store.record_user, user_id, previous_user, 30, 4000.0, perfil)
+        await write_behind.close()
+
+    asyncio.run(scenario())
+    cohort = crud.collections[COHORT_COLLECTION][0]
+    assert cohort["total"] == 1
+    assert cohort["perfis"] == {"moderado": 0, "agressivo": 1}
+    assert crud.collections["usuarios"][0]["perfil_classificado"] == "agressivo"
+
+def test_objective_keywords_skip_filler_words():
+    assert extrair_palavras_chave("Quero comprar minha casa própria com segurança") == ["casa", "seguranca"]
+    assert extrair_palavras_chave("Quero investir para fazer minha aposentadoria em 20 anos") == ["aposentadoria"]
+
+def test_common_objectives_read_only_the_summary(crud, monkeypatch):
+    from app.api.services.analytics_engine import AnalyticsEngine
+    projections = []
+    find_document = crud.find_document
+
+    async def recording_find(collection, query, projection=None):
+        projections.append((collection, projection))
+        return await find_document(collection, query, projection)
+
+    monkeypatch.setattr(crud, "find_document", recording_find)
+    store = CohortStatsStore()
+
+    async def scenario():
+        user_id = await crud.create_document("usuarios", {"idade": 30, "renda_mensal": 4000.0})
+        await store.record_user(user_id, None, 30, 4000.0, "moderado", "Quero comprar minha casa própria")
+        projections.clear()
+        return await AnalyticsEngine()._analyze_objectives({"idade": 30, "renda_mensal": 4000.0})
+
+    assert [entry["objetivo"] for entry in asyncio.run(scenario())] == ["casa"]
+    assert projections == [(COHORT_COLLECTION, {"_id": 0, "resumo.objetivos_comuns": 1})]
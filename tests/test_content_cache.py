@@ -0,0 +1,43 @@
+import asyncio
+import pytest
+from app.api.services import ia_generator
+from app.api.services.content_cache import ContentCache, InMemoryContentCacheBackend, _anonymize, _personalize
+from app.api.services.llm_backends import LLMClient, LocalStubBackend
+
+USER = {"nome": "Maria Silva", "idade": 30, "renda_mensal": 3200.0}
+
+@pytest.fixture
+def generator(monkeypatch):
+    monkeypatch.setattr(ia_generator, "content_cache", ContentCache(InMemoryContentCacheBackend(16, 60)))
+    instance = ia_generator.IAGenerator.__new__(ia_generator.IAGenerator)
+    instance.llm = LLMClient(LocalStubBackend(latency=0, tokens_per_second=0))
+    return instance
+
+def test_cached_prompt_uses_bands_instead_of_exact_values(generator):
+    key = ia_generator.content_cache.key_for("moderado", USER, "comprar casa")
+    cached_prompt = generator._build_prompt("moderado", generator._prompt_user_data(USER, key), "comprar casa")
+    exact_prompt = generator._build_prompt("moderado", generator._prompt_user_data(USER, None), "comprar casa")
+
+    assert "3200" not in cached_prompt and "30 anos" not in cached_prompt
+    assert "entre R$ 2.000 e R$ 5.000" in cached_prompt and "entre 26 e 35 anos" in cached_prompt
+    assert "R$ 3200.00" in exact_prompt and "30 anos" in exact_prompt
+
+def test_same_band_shares_cached_content(generator):
+    async def scenario():
+        first = await generator.generate_content("moderado", USER, "comprar casa")
+        other = {"nome": "João Souza", "idade": 33, "renda_mensal": 4100.0}
+        second = await generator.generate_content("moderado", other, "comprar casa")
+        return first, second
+
+    first, second = asyncio.run(scenario())
+    assert ia_generator.content_cache.hits == 1
+    assert "Maria" not in second
+
+def test_whitespace_only_name_does_not_fail(generator):
+    async def scenario():
+        await generator.generate_content("moderado", USER, "comprar casa")
+        return await generator.generate_content("moderado", {**USER, "nome": "   "}, "comprar casa")
+
+    assert asyncio.run(scenario())
+    assert _personalize(f"Olá, [[PRIMEIRO_NOME]]", "  ") == "Olá, usuário"
+    assert _anonymize("Olá", "  ") == "Olá"
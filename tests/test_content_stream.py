@@ -0,0 +1,46 @@
+import asyncio
+import pytest
+from fastapi.testclient import TestClient
+from app.main import app
+from app.api.routes import content
+from app.api.services import ia_generator, memory_manager
+from app.api.services.content_cache import ContentCache
+from app.api.services.llm_backends import LLMClient, LocalStubBackend
+from app.api.services.memory_manager import MemoryCache
+from tests.fake_mongo import FakeMongoCrud
+
+REQUEST = {
+    "nome": "Ana Souza",
+    "idade": 34,
+    "renda_mensal": 6000.0,
+    "objetivo_financeiro": "Quero montar uma reserva de emergência com segurança",
+    "valor_disponivel_investir": 10000.0,
+    "tempo_investimento": 5
+}
+
+@pytest.fixture
+def client(monkeypatch):
+    FakeMongoCrud().install(monkeypatch)
+    monkeypatch.setattr(memory_manager, "memory_cache", MemoryCache(100, 300, validate=False))
+    monkeypatch.setattr(ia_generator, "content_cache", ContentCache(None))
+    generator = ia_generator.IAGenerator.__new__(ia_generator.IAGenerator)
+    generator.llm = LLMClient(LocalStubBackend(latency=0, tokens_per_second=0))
+    app.dependency_overrides[ia_generator.get_ia_generator] = lambda: generator
+    yield TestClient(app)
+    app.dependency_overrides.clear()
+
+def event_names(body: str):
+    return [line.split(": ", 1)[1] for line in body.splitlines() if line.startswith("event: ")]
+
+def test_peer_analysis_not_held_back_by_slow_simulation(client, monkeypatch):
+    async def slow_simulation(*args):
+        await asyncio.sleep(0.3)  # Selic com cache frio
+        return {"perfil": {}}
+
+    monkeypatch.setattr(content, "_simulate_investment", slow_simulation)
+    response = client.post("/api/gerar-conteudo/stream", json=REQUEST)
+
+    names = event_names(response.text)
+    assert names.index("analise_comparativa") < names.index("simulacao")
+    assert names.index("perfil") < names.index("simulacao")
+    assert names[-1] == "concluido"
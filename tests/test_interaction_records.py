@@ -0,0 +1,70 @@
+import asyncio
+from datetime import datetime
+import pytest
+from bson import ObjectId
+from app.api.services import interaction_records
+from app.api.services.interaction_records import migrate, read_response, HISTORY_COLLECTION, MEMORY_COLLECTION, SCHEMA_VERSION
+from tests.fake_mongo import FakeMongoCrud
+
+def legacy_history(user_id: str, index: int) -> dict:
+    return {
+        "_id": ObjectId(), "user_id": user_id, "perfil_classificado": "moderado",
+        "request": {"nome": "Ana", "objetivo_financeiro": f"objetivo {index}", "peer_analysis": {"total_peers": 3}},
+        "response": "Texto gerado " * 50, "timestamp": datetime(2024, 1, 1)
+    }
+
+def legacy_memory(user_id: str) -> dict:
+    return {
+        "_id": ObjectId(), "user_id": user_id, "versao": 2, "last_interaction": datetime(2024, 1, 2),
+        "preferences": {"interaction_count": 2, "objective_counts": {"casa_propria": 1, "casa_seguranca": 1}},
+        "conversation_history": [
+            {"timestamp": datetime(2024, 1, 1), "profile": "moderado", "objective": "objetivo", "request": {"x": 1}, "response": "longo " * 50}
+        ] * 2
+    }
+
+@pytest.fixture
+def crud(monkeypatch):
+    monkeypatch.setattr(interaction_records, "MIGRATION_BATCH_SIZE", 2)
+    return FakeMongoCrud().install(monkeypatch)
+
+def test_migration_writes_in_batches_while_reading(crud):
+    crud.collections[HISTORY_COLLECTION] = [legacy_history("u1", i) for i in range(5)]
+    crud.collections[MEMORY_COLLECTION] = [legacy_memory(f"u{i}") for i in range(3)]
+
+    report = asyncio.run(migrate())
+
+    assert crud.calls[("find_all_documents", HISTORY_COLLECTION)] == 0
+    assert crud.calls[("bulk_write", HISTORY_COLLECTION)] == 3
+    assert crud.calls[("bulk_write", MEMORY_COLLECTION)] == 2
+    assert report[HISTORY_COLLECTION]["documentos"] == 5
+    assert report[HISTORY_COLLECTION]["bytes_depois"] < report[HISTORY_COLLECTION]["bytes_antes"]
+    for record in crud.collections[HISTORY_COLLECTION]:
+        assert record["versao_esquema"] == SCHEMA_VERSION
+        assert "peer_analysis" not in record["request"]
+        assert read_response(record) == "Texto gerado " * 50
+    for memory in crud.collections[MEMORY_COLLECTION]:
+        assert all("response" not in entry for entry in memory["conversation_history"])
+        assert memory["preferences"] == {"interaction_count": 2}
+
+def test_migration_keeps_interactions_pushed_after_the_read(crud, monkeypatch):
+    crud.collections[MEMORY_COLLECTION] = [legacy_memory("u1")]
+    iterate = crud.iterate_documents
+
+    async def iterate_with_concurrent_push(collection, *args, **kwargs):
+        async for document in iterate(collection, *args, **kwargs):
+            yield document
+            if collection == MEMORY_COLLECTION:
+                # Uma requisição registra uma interação entre a leitura e a gravação da migração
+                await crud.apply_update(MEMORY_COLLECTION, {"user_id": document["user_id"]}, {
+                    "$push": {"conversation_history": {"$each": [{"profile": "agressivo", "objective": "nova"}], "$slice": -10}},
+                    "$inc": {"versao": 1}
+                })
+
+    monkeypatch.setattr(interaction_records.mongodb_crud, "iterate_documents", iterate_with_concurrent_push)
+
+    report = asyncio.run(migrate())
+
+    history = crud.collections[MEMORY_COLLECTION][0]["conversation_history"]
+    assert history[-1] == {"profile": "agressivo", "objective": "nova"}
+    assert len(history) == 3
+    assert report[MEMORY_COLLECTION]["alterados_durante_migracao"] == 1
@@ -0,0 +1,43 @@
+import asyncio
+import time
+import pytest
+from app.api.services.investment_calculator import (
+    InvestmentCalculator, MockSelicAPI, simulation_cache, shutdown_process_pool, _monte_carlo_chunks
+)
+from app.core.config.settings import settings
+
+@pytest.fixture
+def calculator():
+    simulation_cache.clear()
+    calc = InvestmentCalculator()
+    calc.selic_api = MockSelicAPI()
+    return calc
+
+def test_scenarios_use_percent_rates(calculator):
+    scenarios = asyncio.run(calculator.simulate_investment_scenarios(70000, 1000, 5, "conservador"))
+    expected = asyncio.run(calculator.calculate_compound_interest(70000, 1000, 5, 8.0))
+
+    assert scenarios["perfil"]["taxa_anual"] == 8.0
+    assert scenarios["perfil"]["valor_final"] == expected["valor_final"]
+    assert scenarios["selic"]["taxa_anual"] == scenarios["taxa_selic_atual"] == settings.selic_fallback_rate
+    # Com as duas taxas em % a.a., os cenários ficam na mesma ordem de grandeza
+    assert scenarios["pessimista"]["juros_acumulados"] < scenarios["perfil"]["juros_acumulados"] < scenarios["otimista"]["juros_acumulados"]
+    assert scenarios["perfil"]["juros_acumulados"] > 0.4 * scenarios["selic"]["juros_acumulados"]
+
+def test_monte_carlo_chunks_stop_at_the_deadline():
+    started = time.perf_counter()
+    with pytest.raises(TimeoutError):
+        _monte_carlo_chunks(1000, 100, 50, 12.0, 10.0, 200000, 7, 10000, list(range(20)), time.time() - 1)
+    assert time.perf_counter() - started < 0.5
+
+def test_monte_carlo_same_bands_in_thread_and_process_pool(calculator, monkeypatch):
+    monkeypatch.setattr(settings, "monte_carlo_timeout_seconds", 60.0)
+    monkeypatch.setattr(settings, "monte_carlo_chunk_size", 500)
+    in_thread = asyncio.run(calculator.simulate_monte_carlo(1000, 100, 3, "moderado", n_paths=2300, seed=11))
+    monkeypatch.setattr(settings, "monte_carlo_process_threshold", 1000)
+    try:
+        in_processes = asyncio.run(calculator.simulate_monte_carlo(1000, 100, 3, "moderado", n_paths=2300, seed=11))
+    finally:
+        shutdown_process_pool()
+    assert "erro" not in in_thread
+    assert in_thread["percentis"] == in_processes["percentis"]
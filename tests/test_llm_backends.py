@@ -0,0 +1,83 @@
+import asyncio
+import time
+import pytest
+from fastapi.testclient import TestClient
+from app import main
+from app.api.services.llm_backends import LLMBackend, LLMClient, LocalStubBackend
+
+class StallingBackend(LocalStubBackend):
+    """Emite o primeiro pedaço e depois para de responder"""
+
+    name = "travado"
+
+    async def stream(self, prompt: str):
+        yield "primeiro "
+        await asyncio.sleep(3600)
+        yield "nunca"
+
+def test_backend_interface_is_abstract():
+    with pytest.raises(TypeError):
+        LLMBackend(1.0)
+
+def test_stream_timeout_covers_chunks_after_the_first():
+    backend = StallingBackend(latency=0, tokens_per_second=0)
+    backend.timeout = 0.2
+    client = LLMClient(backend)
+
+    async def consume():
+        received = []
+        with pytest.raises(asyncio.TimeoutError):
+            async for chunk in client.stream("prompt"):
+                received.append(chunk)
+        return received
+
+    started = time.perf_counter()
+    assert asyncio.run(consume()) == ["primeiro "]
+    assert time.perf_counter() - started < 1
+
+def test_stream_yields_every_chunk_within_deadline():
+    client = LLMClient(LocalStubBackend(latency=0, tokens_per_second=0))
+
+    async def consume():
+        return "".join([chunk async for chunk in client.stream("Perfil classificado: moderado")])
+
+    assert asyncio.run(consume()) == LocalStubBackend()._text("Perfil classificado: moderado")
+
+def test_cancelled_caller_cancels_primary_request():
+    cancelled = []
+
+    class SlowBackend(LocalStubBackend):
+        name = "lento"
+
+        async def generate(self, prompt: str) -> str:
+            try:
+                await asyncio.sleep(3600)
+            except asyncio.CancelledError:
+                cancelled.append(self.name)
+                raise
+
+    client = LLMClient(SlowBackend(latency=0, tokens_per_second=0), LocalStubBackend(latency=0, tokens_per_second=0))
+
+    async def scenario():
+        # Cancelado antes do prazo do hedge, ainda na primeira espera
+        with pytest.raises(asyncio.TimeoutError):
+            await asyncio.wait_for(client.generate("prompt"), 0.05)
+        await asyncio.sleep(0.01)
+        return list(cancelled)
+
+    assert asyncio.run(scenario()) == ["lento"]
+
+def test_health_reports_error_for_broken_backend(monkeypatch):
+    # O lifespan deixa o gerador vazio quando o backend configurado não pode ser criado
+    monkeypatch.setattr(main.app.state, "ia_generator", None, raising=False)
+    response = TestClient(main.app).get("/health")
+    assert response.status_code == 200
+    assert response.json()["ia_service"] == "error"
+    assert response.json()["llm"] is None
+
+def test_content_route_unavailable_without_generator(monkeypatch):
+    monkeypatch.setattr(main.app.state, "ia_generator", None, raising=False)
+    response = TestClient(main.app).post("/api/gerar-conteudo", json={
+        "nome": "Ana", "idade": 30, "renda_mensal": 4000.0, "objetivo_financeiro": "Reserva de emergência"
+    })
+    assert response.status_code == 503
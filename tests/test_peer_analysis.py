@@ -0,0 +1,28 @@
+import random
+import statistics
+from collections import Counter
+from app.api.services.analytics_engine import AnalyticsEngine
+
+def test_peer_statistics_match_the_exact_values():
+    """Os agregados da pipeline (histograma, contagem, média, posição) reproduzem as estatísticas exatas"""
+    engine = AnalyticsEngine()
+    rng = random.Random(3)
+    for _ in range(50):
+        ages = [rng.randint(25, 35) for _ in range(rng.randint(1, 40))]
+        incomes = [round(rng.uniform(3000, 5000), 2) for _ in ages]
+        user_age, user_income = rng.randint(25, 35), rng.choice(incomes + [round(rng.uniform(3000, 5000), 2)])
+
+        age_counts = [{"_id": age, "total": count} for age, count in Counter(ages).items()]
+        income_stats = [{"_id": None, "total": len(incomes), "media": statistics.mean(incomes),
+                         "abaixo": sum(1 for income in incomes if income < user_income)}]
+        age_result = engine._analyze_age_group(age_counts, user_age)
+        income_result = engine._analyze_income(income_stats, user_income)
+
+        assert age_result["media_idade"] == round(statistics.mean(ages), 1)
+        assert age_result["mediana_idade"] == statistics.median(ages)
+        assert income_result["quartil"] == engine._get_income_quartile(user_income, incomes)
+
+def test_peer_statistics_without_data():
+    engine = AnalyticsEngine()
+    assert engine._analyze_age_group([], 30)["comparacao"] == "sem dados"
+    assert engine._analyze_income([], 4000.0) == {"comparacao": "sem dados"}
@@ -0,0 +1,45 @@
+import pytest
+from fastapi.testclient import TestClient
+from app.main import app
+from app.api.services import ia_generator, memory_manager
+from app.api.services.content_cache import ContentCache
+from app.api.services.llm_backends import LLMClient, LocalStubBackend
+from app.api.services.memory_manager import MemoryCache, MEMORY_COLLECTION
+from tests.fake_mongo import FakeMongoCrud
+
+REQUEST = {
+    "nome": "Ana Souza",
+    "idade": 34,
+    "renda_mensal": 6000.0,
+    "objetivo_financeiro": "Quero montar uma reserva de emergência com segurança"
+}
+
+@pytest.fixture
+def crud(monkeypatch):
+    fake = FakeMongoCrud().install(monkeypatch)
+    monkeypatch.setattr(memory_manager, "memory_cache", MemoryCache(100, 300, validate=True))
+    monkeypatch.setattr(ia_generator, "content_cache", ContentCache(None))
+    generator = ia_generator.IAGenerator.__new__(ia_generator.IAGenerator)
+    generator.llm = LLMClient(LocalStubBackend(latency=0, tokens_per_second=0))
+    app.dependency_overrides[ia_generator.get_ia_generator] = lambda: generator
+    yield fake
+    app.dependency_overrides.clear()
+
+def memory_reads(crud) -> int:
+    return crud.calls[("find_document", MEMORY_COLLECTION)] + crud.calls[("find_all_documents", MEMORY_COLLECTION)]
+
+@pytest.mark.parametrize("path", ["/api/gerar-conteudo", "/api/gerar-conteudo/stream"])
+def test_one_user_memory_read_per_request(crud, path):
+    client = TestClient(app)
+    for request_number in range(1, 4):
+        reads_before = memory_reads(crud)
+        response = client.post(path, json=REQUEST)
+        assert response.status_code in (200, 201)
+        # Primeira requisição: leitura do documento; seguintes: validação do cache
+        assert memory_reads(crud) - reads_before == 1
+
+    memory = crud.collections[MEMORY_COLLECTION]
+    assert len(memory) == 1
+    assert len(memory[0]["conversation_history"]) == 3
+    # Estatísticas da coorte gravadas em segundo plano: um usuário, contado uma vez
+    assert crud.collections["cohort_stats"][0]["total"] == 1
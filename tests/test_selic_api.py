@@ -0,0 +1,117 @@
+import asyncio
+import json
+import threading
+import time
+from datetime import date, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import pytest
+from app.api.services import selic_api, selic_store as selic_store_module
+from app.api.services.selic_api import SelicAPI, annualize_daily_rate
+from app.api.services.selic_store import SelicSeriesStore
+from app.core.config.settings import settings
+from app.core.utils.circuit_breaker import CircuitBreaker
+from tests.fake_mongo import FakeMongoCrud
+
+# Série 11: taxa diária (% a.d.), exposta pela API em % a.a.
+CURRENT = annualize_daily_rate(0.055131)
+
+class StandInBCB:
+    """Servidor HTTP local no lugar da API SGS do BCB, com atraso configurável"""
+
+    def __init__(self, delay: float = 0.2):
+        self.delay = delay
+        self.requests = []
+        self.points = [{"data": (date.today() - timedelta(days=1)).strftime("%d/%m/%Y"), "valor": "0.055131"}]
+        stand_in = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                stand_in.requests.append(self.path)
+                time.sleep(stand_in.delay)
+                body = json.dumps(stand_in.points).encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}/dados"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+@pytest.fixture
+def bcb(monkeypatch):
+    server = StandInBCB()
+    store = SelicSeriesStore()
+    monkeypatch.setattr(settings, "selic_api_url", server.url)
+    monkeypatch.setattr(selic_store_module, "mongodb_crud", FakeMongoCrud())
+    monkeypatch.setattr(selic_api, "selic_store", store)
+    monkeypatch.setattr(selic_api, "_cache", selic_api._SelicCache())
+    monkeypatch.setattr(selic_api, "_breaker", CircuitBreaker())
+    yield server
+    server.close()
+
+def run(coro):
+    async def with_client():
+        try:
+            return await coro
+        finally:
+            await selic_api.close_http_client()
+    return asyncio.run(with_client())
+
+def test_concurrent_refreshes_share_one_upstream_fetch(bcb):
+    async def scenario():
+        return await asyncio.gather(*(SelicAPI().refresh() for _ in range(500)))
+
+    values = run(scenario())
+    assert set(values) == {CURRENT}
+    assert len(bcb.requests) == 1
+    assert selic_api._cache.upstream_calls == 1
+
+def test_concurrent_cold_reads_trigger_one_background_fetch(bcb):
+    async def scenario():
+        started = time.perf_counter()
+        values = await asyncio.gather(*(SelicAPI().get_current_selic() for _ in range(500)))
+        elapsed = time.perf_counter() - started
+        await selic_api._cache.inflight
+        return values, elapsed
+
+    values, elapsed = run(scenario())
+    # Sem valor em cache nem série local: ninguém espera pela rede
+    assert set(values) == {None}
+    assert elapsed < bcb.delay
+    assert len(bcb.requests) == 1
+    assert selic_api._cache.value == CURRENT
+
+def test_stale_read_returns_before_refresh_completes(bcb):
+    async def scenario():
+        api = SelicAPI()
+        await api.refresh()
+        bcb.points = [{"data": date.today().strftime("%d/%m/%Y"), "valor": "0.053400"}]
+        bcb.delay = 0.5
+        selic_api._cache.fetched_at -= settings.selic_cache_ttl_seconds + 1
+
+        started = time.perf_counter()
+        stale = await asyncio.gather(*(api.get_current_selic() for _ in range(500)))
+        elapsed = time.perf_counter() - started
+        refreshed = await selic_api._cache.inflight
+        return stale, elapsed, refreshed, await api.get_current_selic()
+
+    stale, elapsed, refreshed, current = run(scenario())
+    assert set(stale) == {CURRENT}
+    assert elapsed < bcb.delay
+    assert refreshed == current == annualize_daily_rate(0.0534)
+    # Uma busca inicial e uma única atualização para as 500 leituras expiradas
+    assert len(bcb.requests) == 2
+
+def test_daily_rate_is_annualized():
+    assert CURRENT == pytest.approx(14.9, abs=0.05)
+    assert annualize_daily_rate(0) == 0
+    assert annualize_daily_rate(None) is None
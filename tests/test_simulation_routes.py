@@ -0,0 +1,32 @@
+import json
+from fastapi.testclient import TestClient
+from app.main import app
+
+# Sem o bloco `with`, o TestClient não executa o lifespan (nem conecta ao MongoDB)
+client = TestClient(app)
+
+SIMULATION = {"valor_inicial": 10000, "aporte_mensal": 500, "tempo_anos": 5, "taxa_anual": 12, "perfil_risco": "moderado"}
+
+def test_single_simulation_returns_metrics():
+    response = client.post("/api/simular-investimento", json=SIMULATION)
+    assert response.status_code == 200
+    body = response.json()
+    assert body["total_investido"] == 40000
+    assert body["valor_final"] > body["total_investido"]
+    assert body["metricas"]["meses"] == 60
+    assert body["metricas"]["rentabilidade_total_percentual"] > 0
+    assert len(body["projecao_mensal"]) == 5
+
+def test_single_simulation_is_served_from_cache():
+    first = client.post("/api/simular-investimento", json=SIMULATION).json()
+    second = client.post("/api/simular-investimento", json=SIMULATION).json()
+    assert first == second
+
+def test_batch_matches_single_endpoint():
+    single = client.post("/api/simular-investimento", json=SIMULATION).json()
+    response = client.post("/api/simular-investimento/lote", json={"simulacoes": [SIMULATION, {**SIMULATION, "taxa_anual": 0}]})
+    assert response.status_code == 200
+    lines = [json.loads(line) for line in response.text.splitlines()]
+    assert [line["indice"] for line in lines] == [0, 1]
+    assert lines[0]["valor_final"] == single["valor_final"]
+    assert lines[1]["valor_final"] == lines[1]["total_investido"] == 40000
@@ -0,0 +1,72 @@
+import bisect
+import math
+import random
+import pytest
+from app.core.utils.sketches import KLLSketch
+from app.api.services.cohort_stats import income_quartile
+from app.api.services.analytics_engine import AnalyticsEngine
+
+N = 20_000
+# Erro de rank documentado do KLLSketch (k=200): ~1,65% com 99% de confiança
+RANK_ERROR = 0.0165
+QUANTILES = [0.01, 0.1, 0.25, 0.5, 0.75, 0.9, 0.99]
+
+def uniform_incomes(rng):
+    return [rng.uniform(1000, 30000) for _ in range(N)]
+
+def lognormal_incomes(rng):
+    return [rng.lognormvariate(8.3, 0.7) for _ in range(N)]
+
+def build_sketch(values):
+    sketch = KLLSketch()
+    for value in values:
+        sketch.add(value)
+    return sketch
+
+@pytest.fixture(autouse=True)
+def seeded_random():
+    # As compactações do KLL sorteiam metades com o módulo random
+    random.seed(1234)
+
+@pytest.mark.parametrize("generator", [uniform_incomes, lognormal_incomes])
+def test_quantile_rank_error_within_bound(generator):
+    values = generator(random.Random(7))
+    exact = sorted(values)
+    sketch = build_sketch(values)
+
+    assert sketch.n == N
+    for q in QUANTILES:
+        estimate = sketch.quantile(q)
+        rank = bisect.bisect_left(exact, estimate) / N
+        assert abs(rank - q) <= RANK_ERROR, (q, rank)
+
+@pytest.mark.parametrize("generator", [uniform_incomes, lognormal_incomes])
+def test_income_quartile_matches_sort_based_answer(generator):
+    rng = random.Random(11)
+    values = generator(rng)
+    exact = sorted(values)
+    cuts = build_sketch(values).quantiles([0.25, 0.5, 0.75])
+    engine = AnalyticsEngine()
+
+    checked = 0
+    for income in rng.sample(values, 2000):
+        rank = bisect.bisect_left(exact, income) / N
+        # Perto de um ponto de corte, a resposta pode mudar dentro do erro do sketch
+        if any(abs(rank - cut) <= RANK_ERROR for cut in (0.25, 0.5, 0.75)):
+            continue
+        assert income_quartile(income, cuts) == engine._get_income_quartile(income, exact)
+        checked += 1
+    assert checked > 1500
+
+def test_exact_below_capacity():
+    values = [float(v) for v in random.Random(3).sample(range(10_000), 150)]
+    sketch = build_sketch(values)
+    exact = sorted(values)
+    for q in QUANTILES:
+        assert sketch.quantile(q) == exact[max(0, math.ceil(q * len(exact)) - 1)]
+
+def test_serialization_round_trip():
+    sketch = build_sketch(uniform_incomes(random.Random(5)))
+    restored = KLLSketch.from_dict(sketch.to_dict())
+    assert restored.n == sketch.n
+    assert restored.quantiles(QUANTILES) == sketch.quantiles(QUANTILES)